@@ -3,10 +3,9 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from pathlib import Path
-from typing import Any, Union
+from typing import Annotated, Any, Union
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_validator, model_validator
 
 
 class BundleFormat(str, Enum):
@@ -14,10 +13,30 @@ class BundleFormat(str, Enum):
     JSONL = "jsonl"
 
 
+def _check_relative_path(v: str) -> str:
+    """Reject bundle file paths that could escape the bundle root."""
+    # Plain string checks, with the same rules as PurePosixPath.is_absolute() and '..' in its parts;
+    # this runs for every file reference in every manifest
+    if v.startswith("/"):
+        raise ValueError("path must be relative to the bundle root")
+    if v == ".." or v.startswith("../") or v.endswith("/..") or "/../" in v:
+        raise ValueError("path must not contain '..'")
+    return v
+
+
+# Enum members resolved once, keyed by lowercase file extension
+_FORMAT_BY_SUFFIX = {".jsonl": BundleFormat.JSONL, ".json": BundleFormat.JSON}
+
+
+def _guess_format(path: str) -> BundleFormat:
+    """Infer the file format of a bundle file from its extension, defaulting to JSON."""
+    return _FORMAT_BY_SUFFIX.get(path[path.rfind(".") :].lower(), BundleFormat.JSON)
+
+
 class FileRef(BaseModel):
     """Reference to a file in the mounted bundle directory."""
 
-    model_config = ConfigDict(frozen=True)
+    model_config = ConfigDict(frozen=True, defer_build=True)
 
     path: str = Field(..., description="Relative path within the bundle directory")
     format: BundleFormat = BundleFormat.JSONL
@@ -25,18 +44,13 @@ class FileRef(BaseModel):
     @field_validator("path")
     @classmethod
     def _path_must_be_relative(cls, v: str) -> str:
-        p = Path(v)
-        if p.is_absolute():
-            raise ValueError("path must be relative to the bundle root")
-        if ".." in p.parts:
-            raise ValueError("path must not contain '..'")
-        return v
+        return _check_relative_path(v)
 
 
 class IdFields(BaseModel):
     """Declare the field names used by entity and relationship rows."""
 
-    model_config = ConfigDict(frozen=True)
+    model_config = ConfigDict(frozen=True, defer_build=True)
 
     entity_id: str = "entity_id"
     entity_type: str = "entity_type"
@@ -58,7 +72,8 @@ class BundleManifestV1(BaseModel):
     Supports both v1 format styles (FileRef objects or simple file paths).
     """
 
-    model_config = ConfigDict(frozen=True, extra="allow")
+    # Only needed when a bundle is loaded, so the schema is built on first use, not at import
+    model_config = ConfigDict(frozen=True, extra="allow", defer_build=True)
 
     bundle_version: Union[int, str] = Field(default="v1", description="Bundle format version (1 or 'v1')")
     domain: str = Field(..., description="Human-readable domain name, e.g. 'sherlock'")
@@ -98,19 +113,20 @@ class BundleManifestV1(BaseModel):
             raise ValueError("domain must be non-empty")
         return v2
 
+    @field_validator("entities_file", "relationships_file", "documents_file")
+    @classmethod
+    def _file_paths_must_be_relative(cls, v: str | None) -> str | None:
+        return v if v is None else _check_relative_path(v)
+
     @model_validator(mode="after")
     def _normalize_file_refs(self) -> "BundleManifestV1":
         """Convert string file paths to FileRef objects for uniform access."""
+        # The paths were already checked above, so skip re-validating them in FileRef.
         # We can't mutate frozen model, so we use object.__setattr__
-        if self.entities is None and self.entities_file:
-            fmt = BundleFormat.JSONL if self.entities_file.endswith(".jsonl") else BundleFormat.JSON
-            object.__setattr__(self, "entities", FileRef(path=self.entities_file, format=fmt))
-        if self.relationships is None and self.relationships_file:
-            fmt = BundleFormat.JSONL if self.relationships_file.endswith(".jsonl") else BundleFormat.JSON
-            object.__setattr__(self, "relationships", FileRef(path=self.relationships_file, format=fmt))
-        if self.documents is None and self.documents_file:
-            fmt = BundleFormat.JSONL if self.documents_file.endswith(".jsonl") else BundleFormat.JSON
-            object.__setattr__(self, "documents", FileRef(path=self.documents_file, format=fmt))
+        for ref_field, path_field in (("entities", "entities_file"), ("relationships", "relationships_file"), ("documents", "documents_file")):
+            path = getattr(self, path_field)
+            if getattr(self, ref_field) is None and path:
+                object.__setattr__(self, ref_field, FileRef.model_construct(path=path, format=_guess_format(path)))
         return self
 
     def get_version_str(self) -> str:
@@ -120,11 +136,14 @@ class BundleManifestV1(BaseModel):
         return self.bundle_version
 
 
-# --- Optional row-level models for validation during ingest ---
+# --- Optional row-level models describing the bundle's JSONL rows ---
+# The loader does not validate rows with these: storage backends normalize the parsed
+# JSON straight into the ORM models. They are rarely constructed, so their schemas
+# are built on first use rather than at import.
 
 
 class EntityRow(BaseModel):
-    model_config = ConfigDict(frozen=True, extra="allow")
+    model_config = ConfigDict(frozen=True, extra="allow", defer_build=True)
 
     entity_id: str
     entity_type: str
@@ -138,7 +157,7 @@ class EntityRow(BaseModel):
 
 
 class RelationshipRow(BaseModel):
-    model_config = ConfigDict(frozen=True, extra="allow")
+    model_config = ConfigDict(frozen=True, extra="allow", defer_build=True)
 
     subject_id: str
     predicate: str
@@ -154,20 +173,13 @@ class DocumentRow(BaseModel):
     Optional document row (only used if documents_file is present).
     """
 
-    model_config = ConfigDict(frozen=True, extra="allow")
+    model_config = ConfigDict(frozen=True, extra="allow", defer_build=True)
 
-    document_id: str = Field(..., min_length=1)
+    # Stripped before the length check, so whitespace alone is rejected too
+    document_id: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
 
     title: str | None = None
     source_url: str | None = None
     published_at: datetime | None = None
 
     metadata: dict[str, Any] = Field(default_factory=dict)
-
-    @field_validator("document_id")
-    @classmethod
-    def non_empty_str(cls, v: str) -> str:
-        v = v.strip()
-        if not v:
-            raise ValueError("document_id must be a non-empty string")
-        return v
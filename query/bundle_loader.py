@@ -4,35 +4,49 @@ Bundle loading utilities for the KG server.
 Handles loading bundles from directories or ZIP files at startup.
 """
 
-import json
 import os
 import sys
 import logging
+import mmap
 import shutil
 import subprocess
 import tempfile
 import zipfile
-from pathlib import Path
+from collections import Counter
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Iterator
 
+import orjson
+from sqlalchemy import Integer, inspect
 from sqlmodel import Session, SQLModel, delete
 
 from .bundle import BundleManifestV1
 from storage.backends.sqlite import SQLiteStorage
 from storage.backends.postgres import PostgresStorage
+from storage.models import Bundle, Relationship
 
-# from storage.backends.sqlite import SQLiteStorage
-from storage.models.bundle import Bundle
-from storage.models.entity import Entity
-from storage.models.relationship import Relationship
+# Values of BUNDLE_FORCE_RELOAD that turn it on
+_TRUTHY = frozenset({"1", "true", "yes", "on", "y", "t"})
 
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-ch = logging.StreamHandler(sys.stdout)
-ch.setLevel(logging.DEBUG)
+# Where document assets and the MkDocs config are installed
+_DOCS_DIR = Path("/app/docs")
+_MKDOCS_YML = Path("/app/mkdocs.yml")
+# Records the bundle_id whose assets are in _DOCS_DIR. It lives in that directory so
+# it disappears along with the assets, e.g. when the container is recreated.
+_ASSETS_SENTINEL = _DOCS_DIR / ".mkdocs_built_bundle"
+
+# Indexes that earlier versions of the models created and that are now redundant
+_OBSOLETE_INDEXES = ("ix_relationship_subject_id", "ix_relationship_object_id", "ix_entity_entity_type")
+
+logger = logging.getLogger(__name__)
 FORMAT = "%(levelname)s:     %(asctime)s - %(pathname)s:%(lineno)d - %(message)s"
-formatter = logging.Formatter(FORMAT)
-ch.setFormatter(formatter)
-logger.addHandler(ch)
+
+
+def _configure_logging() -> None:
+    """Make sure bundle loading output is visible, at the level given by LOG_LEVEL."""
+    # No-op if the application has already configured logging
+    logging.basicConfig(format=FORMAT, stream=sys.stdout)
+    logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
 
 
 def load_bundle_at_startup(engine, db_url: str) -> None:
@@ -41,22 +55,26 @@ def load_bundle_at_startup(engine, db_url: str) -> None:
 
     Environment variables:
         BUNDLE_PATH: Path to a bundle directory or ZIP file
+        LOG_LEVEL: Log level for bundle loading messages (default INFO)
     """
+    _configure_logging()
     bundle_path = os.getenv("BUNDLE_PATH")
     logger.info("bundle_path=%s", bundle_path)
     if not bundle_path:
-        print("BUNDLE_PATH not set, skipping bundle load.")
+        logger.warning("BUNDLE_PATH not set, skipping bundle load.")
         return
 
     bundle_path = Path(bundle_path)
     if not bundle_path.exists():
-        print(f"Warning: BUNDLE_PATH '{bundle_path}' does not exist, skipping bundle load.")
+        logger.warning("BUNDLE_PATH '%s' does not exist, skipping bundle load.", bundle_path)
         return
 
     logger.info("Loading bundle from: %s", bundle_path)
 
     # Ensure tables exist
+    _drop_outdated_relationship_table(engine)
     SQLModel.metadata.create_all(engine)
+    _create_missing_indexes(engine)
 
     # Handle ZIP file vs directory
     if bundle_path.suffix == ".zip":
@@ -64,31 +82,69 @@ def load_bundle_at_startup(engine, db_url: str) -> None:
     elif bundle_path.is_dir():
         _load_from_directory(engine, db_url, bundle_path)
     else:
-        print(f"Warning: BUNDLE_PATH '{bundle_path}' is not a directory or ZIP file.")
+        logger.warning("BUNDLE_PATH '%s' is not a directory or ZIP file.", bundle_path)
+
+
+def _drop_outdated_relationship_table(engine) -> None:
+    """
+    Drop the relationship table if it still has the old UUID primary key, along with the
+    bundle records, so that create_all rebuilds it and the bundle is loaded into it again.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(Relationship.__tablename__):
+        return
+    id_column = next((column for column in inspector.get_columns(Relationship.__tablename__) if column["name"] == "id"), None)
+    if id_column is None or isinstance(id_column["type"], Integer):
+        return
+    logger.warning("Relationship table has an outdated %s primary key; dropping it so the bundle is reloaded", id_column["type"])
+    with engine.begin() as conn:
+        Relationship.__table__.drop(conn)
+        conn.execute(delete(Bundle))
+
+
+def _create_missing_indexes(engine) -> None:
+    """
+    Create model indexes that are missing from the database, and drop ones the models no longer declare.
+    create_all skips tables that already exist, so it never adds indexes declared after
+    a table was first created.
+    """
+    with engine.begin() as conn:
+        for name in _OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 
 def _load_from_zip(engine, db_url: str, zip_path: Path) -> None:
-    """Extract and load a bundle from a ZIP file."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(tmpdir)
+    """Load a bundle from a ZIP file.
 
+    The manifest and the documents index are read straight from the archive. Only the
+    entity and relationship files, which storage backends read by path, are extracted,
+    and only if the bundle is not already loaded.
+    """
+    with zipfile.ZipFile(zip_path, "r") as zf:
         # Find the manifest - could be at root or in a subdirectory
-        tmpdir_path = Path(tmpdir)
-        manifest_path = _find_manifest(tmpdir_path)
-        if not manifest_path:
-            print(f"Error: No manifest.json found in ZIP file {zip_path}")
+        manifest_name = _find_manifest_in_zip(zf)
+        if not manifest_name:
+            logger.error("No manifest.json found in ZIP file %s", zip_path)
             return
 
-        bundle_dir = manifest_path.parent
-        _do_load(engine, db_url, bundle_dir, manifest_path)
+        bundle_root = PurePosixPath(manifest_name).parent
+        manifest = BundleManifestV1.model_validate_json(zf.read(manifest_name))
+        logger.info("Loaded manifest for bundle: %s (domain: %s)", manifest.bundle_id, manifest.domain)
+
+        # Load document assets if present
+        _load_document_assets(bundle_root, manifest, archive=zf)
+
+        _load_into_storage(engine, db_url, bundle_root, manifest, archive=zf)
 
 
 def _load_from_directory(engine, db_url: str, bundle_dir: Path) -> None:
     """Load a bundle from a directory."""
     manifest_path = _find_manifest(bundle_dir)
     if not manifest_path:
-        print(f"Error: No manifest.json found in {bundle_dir}")
+        logger.error("No manifest.json found in %s", bundle_dir)
         return
 
     bundle_dir = manifest_path.parent
@@ -102,114 +158,228 @@ def _find_manifest(search_dir: Path) -> Path | None:
     if direct.exists():
         return direct
 
-    # Check one level of subdirectories
-    for subdir in search_dir.iterdir():
-        if subdir.is_dir():
-            manifest = subdir / "manifest.json"
-            if manifest.exists():
-                return manifest
+    # Check one level of subdirectories; DirEntry.is_dir() answers from the
+    # directory listing itself, so only candidate directories cost a stat
+    with os.scandir(search_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                manifest = os.path.join(entry.path, "manifest.json")
+                if os.path.exists(manifest):
+                    return Path(manifest)
+
+    return None
+
+
+def _find_manifest_in_zip(zf: zipfile.ZipFile) -> str | None:
+    """Find manifest.json in a ZIP archive (possibly in a top-level directory)."""
+    names = zf.namelist()
+    if "manifest.json" in names:
+        return "manifest.json"
+
+    for name in names:
+        parts = name.split("/")
+        if len(parts) == 2 and parts[1] == "manifest.json":
+            return name
 
     return None
 
 
-def _load_document_assets(bundle_dir: Path, manifest: BundleManifestV1) -> None:
+def _bundle_file_exists(path: PurePath, archive: zipfile.ZipFile | None) -> bool:
+    """Check whether a bundle file exists on disk or, if given, in the archive."""
+    if archive is None:
+        return Path(path).exists()
+    try:
+        archive.getinfo(path.as_posix())
+    except KeyError:
+        return False
+    return True
+
+
+def _iter_bundle_lines(path: PurePath, archive: zipfile.ZipFile | None) -> Iterator[bytes]:
+    """Yield the non-empty lines of a bundle file as bytes, without line endings.
+
+    Files on disk are memory-mapped and split with ``mmap.find``, so no per-line
+    read buffer is allocated. Archive members are read line by line.
+    """
+    if archive is not None:
+        with archive.open(path.as_posix()) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        return
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            end = len(mm)
+            while start < end:
+                nl = mm.find(b"\n", start)
+                if nl < 0:
+                    nl = end
+                line = mm[start:nl].strip()
+                start = nl + 1
+                if line:
+                    yield line
+
+
+def _copy_bundle_file(source: PurePath, dest_path: Path, archive: zipfile.ZipFile | None) -> None:
+    """Copy a bundle file to dest_path, streaming it out of the archive if given.
+
+    On-disk copies use ``os.copy_file_range`` where available so the data never leaves
+    the kernel. File metadata is not copied; the assets are only read by mkdocs.
+    """
+    if archive is not None:
+        with archive.open(source.as_posix()) as src, open(dest_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return
+
+    with open(source, "rb") as src, open(dest_path, "wb") as dst:
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(src.fileno(), dst.fileno(), 1 << 30):
+                    pass
+                return
+            except OSError:
+                # Unsupported by this filesystem; start over in user space
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        shutil.copyfileobj(src, dst)
+
+
+def _force_reload_requested() -> bool:
+    """Whether BUNDLE_FORCE_RELOAD asks for the bundle to be loaded again."""
+    return os.environ.get("BUNDLE_FORCE_RELOAD", "").lower() in _TRUTHY
+
+
+def _load_document_assets(bundle_dir: PurePath, manifest: BundleManifestV1, archive: zipfile.ZipFile | None = None) -> None:
     """Load document assets from documents.jsonl into /app/docs.
 
     Reads the documents.jsonl file (if present) and copies all listed assets
     to /app/docs, preserving directory structure. Special handling for mkdocs.yml
     which is moved to /app/mkdocs.yml.
+
+    If ``archive`` is given, ``bundle_dir`` is the bundle root inside that ZIP file
+    and the index and assets are streamed from it rather than read from disk.
+
+    Nothing is copied or rebuilt if the assets of this bundle are already in place,
+    unless BUNDLE_FORCE_RELOAD is set.
     """
     if not manifest.documents:
         return
 
+    if not _force_reload_requested() and _ASSETS_SENTINEL.is_file() and _ASSETS_SENTINEL.read_text(encoding="utf-8") == manifest.bundle_id:
+        logger.info("Document assets for bundle %s already installed, skipping", manifest.bundle_id)
+        return
+
     documents_file = bundle_dir / manifest.documents.path
-    if not documents_file.exists():
+    if not _bundle_file_exists(documents_file, archive):
         logger.warning("Documents file %s not found, skipping document asset loading", documents_file)
         return
 
-    app_docs = Path("/app/docs")
-    app_docs.mkdir(parents=True, exist_ok=True)
+    _DOCS_DIR.mkdir(parents=True, exist_ok=True)
+    _ASSETS_SENTINEL.unlink(missing_ok=True)
 
     asset_count = 0
-    with open(documents_file, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+    # Problems are counted per kind and reported once, not per asset
+    skipped = Counter()
+    created_dirs = {_DOCS_DIR}
+    # Read raw bytes: orjson decodes UTF-8 itself, so skip the text-mode decode
+    for line in _iter_bundle_lines(documents_file, archive):
+        try:
+            asset = orjson.loads(line)
+            asset_path = asset.get("path")
+            if not asset_path:
+                skipped["entries without a path"] += 1
                 continue
 
-            try:
-                asset = json.loads(line)
-                asset_path = asset.get("path")
-                if not asset_path:
-                    logger.warning("Skipping asset entry without path: %s", line)
-                    continue
-
-                # Source file in bundle
-                source_file = bundle_dir / asset_path
-                if not source_file.exists():
-                    logger.warning("Asset file not found: %s", source_file)
-                    continue
-
-                # Destination in /app/docs (strip "docs/" prefix if present)
-                if asset_path.startswith("docs/"):
-                    rel_path = asset_path[5:]  # Remove "docs/" prefix
-                else:
-                    rel_path = asset_path
-
-                # Special handling for mkdocs.yml - move to /app root
-                if rel_path == "mkdocs.yml" or asset_path.endswith("/mkdocs.yml"):
-                    dest_path = Path("/app/mkdocs.yml")
-                    shutil.copy2(source_file, dest_path)
-                    logger.info("Copied %s to %s", source_file, dest_path)
-                    asset_count += 1
-                    continue
-
-                # Regular file - copy to /app/docs preserving structure
-                dest_path = app_docs / rel_path
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(source_file, dest_path)
-                asset_count += 1
+            # Source file in bundle
+            source_file = bundle_dir / asset_path
+            if not _bundle_file_exists(source_file, archive):
+                logger.debug("Asset file not found: %s", source_file)
+                skipped["assets whose file is missing"] += 1
+                continue
+
+            # Destination in /app/docs (strip "docs/" prefix if present)
+            rel_path = asset_path.removeprefix("docs/")
 
-            except json.JSONDecodeError as e:
-                logger.warning("Failed to parse asset entry: %s... Error: %s", line[:100], e)
+            # Special handling for mkdocs.yml - move to /app root
+            if rel_path == "mkdocs.yml" or asset_path.endswith("/mkdocs.yml"):
+                dest_path = _MKDOCS_YML
+                _copy_bundle_file(source_file, dest_path, archive)
+                asset_count += 1
                 continue
 
+            # Regular file - copy to /app/docs preserving structure
+            dest_path = _DOCS_DIR / rel_path
+            if dest_path.parent not in created_dirs:
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(dest_path.parent)
+            _copy_bundle_file(source_file, dest_path, archive)
+            asset_count += 1
+
+        except orjson.JSONDecodeError:
+            skipped["entries that are not valid JSON"] += 1
+            continue
+
+    for reason, count in skipped.items():
+        logger.warning("Skipped %d %s in %s", count, reason, documents_file)
     if asset_count > 0:
         logger.info("Loaded %s document assets to /app/docs", asset_count)
 
-        # Build mkdocs if mkdocs.yml exists
-        mkdocs_yml = Path("/app/mkdocs.yml")
-        if mkdocs_yml.exists():
-            logger.info("Building MkDocs documentation...")
-            result = subprocess.run(["uv", "run", "mkdocs", "build"], capture_output=True, text=True, check=False)
-            if result.returncode == 0:
-                logger.info("MkDocs build completed successfully")
-            else:
-                logger.warning("MkDocs build failed: %s", result.stderr)
+        # Build mkdocs if mkdocs.yml exists; leave no sentinel if that fails so it is retried
+        if not _MKDOCS_YML.exists() or _build_mkdocs():
+            _ASSETS_SENTINEL.write_text(manifest.bundle_id, encoding="utf-8")
+
+
+def _build_mkdocs() -> bool:
+    """Build the MkDocs site from /app/mkdocs.yml. Returns True on success."""
+    logger.info("Building MkDocs documentation...")
+    result = subprocess.run(["uv", "run", "mkdocs", "build"], capture_output=True, text=True, check=False)
+    if result.returncode == 0:
+        logger.info("MkDocs build completed successfully")
+        return True
+    logger.warning("MkDocs build failed: %s", result.stderr)
+    return False
 
 
 def _do_load(engine, db_url: str, bundle_dir: Path, manifest_path: Path) -> None:
-    """Actually load the bundle into storage."""
+    """Load the bundle in bundle_dir, described by manifest_path, into storage."""
     # Parse manifest
-    manifest = BundleManifestV1.model_validate_json(manifest_path.read_text())
+    manifest = BundleManifestV1.model_validate_json(manifest_path.read_bytes())
     logger.info("Loaded manifest for bundle: %s (domain: %s)", manifest.bundle_id, manifest.domain)
 
     # Load document assets if present
     _load_document_assets(bundle_dir, manifest)
 
-    with Session(engine) as session:
-        storage = PostgresStorage(session) if db_url.startswith("postgres") else SQLiteStorage(session)
-        force = os.getenv("BUNDLE_FORCE_RELOAD", "").lower() in {"1", "true", "yes"}
-        if storage.is_bundle_loaded(manifest.bundle_id) and not force:
-            logger.info("Bundle %s already loaded. Skipping.", manifest.bundle_id)
-            return
+    _load_into_storage(engine, db_url, bundle_dir, manifest)
+
 
+def _load_into_storage(engine, db_url: str, bundle_dir: PurePath, manifest: BundleManifestV1, archive: zipfile.ZipFile | None = None) -> None:
+    """Actually load the bundle's entities and relationships into storage.
+
+    If ``archive`` is given, ``bundle_dir`` is the bundle root inside that ZIP file.
+    The entity and relationship files are then extracted, since storage backends read
+    them by path, but only once it is known that the bundle needs loading.
+    """
+    with Session(engine) as session:
+        storage = PostgresStorage(session) if db_url.startswith("postgres") else SQLiteStorage(session=session)
+        force = _force_reload_requested()
         if force:
             logger.info("Force reload enabled: clearing Bundle, Relationship, and Entity tables...")
-            session.exec(delete(Bundle))
-            session.exec(delete(Relationship))
-            session.exec(delete(Entity))
-            session.commit()
+        if not storage.prepare_reload(manifest.bundle_id, force):
+            logger.info("Bundle %s already loaded. Skipping.", manifest.bundle_id)
+            return
 
-        storage.load_bundle(manifest, str(bundle_dir))
+        if archive is None:
+            storage.load_bundle(manifest, str(bundle_dir))
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                for ref in (manifest.entities, manifest.relationships):
+                    if ref is not None and _bundle_file_exists(bundle_dir / ref.path, archive):
+                        archive.extract((bundle_dir / ref.path).as_posix(), tmpdir)
+                storage.load_bundle(manifest, str(Path(tmpdir) / bundle_dir))
         logger.info("Bundle %s loaded successfully.", manifest.bundle_id)
@@ -0,0 +1,59 @@
+"""
+Per-request DataLoaders and read caches for the GraphQL API.
+
+Nested resolvers load entities through these instead of calling storage.get_entity,
+so all the lookups made while resolving one request are batched into one query.
+Root lookups by key go through a request-scoped cache, so a query that asks for the
+same entity or relationship several times reads it once.
+
+Storage calls block, so resolvers make them through call_storage, which runs them on
+a worker thread instead of the event loop. The request's storage has a single session,
+which must not be used from two threads at once, so a request's calls run one at a time.
+"""
+
+import asyncio
+from collections.abc import Hashable
+from typing import Callable, Optional, TypeVar
+from strawberry.dataloader import DataLoader
+from strawberry.types import Info
+from storage.models import Entity
+
+T = TypeVar("T")
+
+
+async def call_storage(context: dict, call: Callable[[], T]) -> T:
+    """Run a blocking storage call on a worker thread, after any other call of the same request."""
+    lock = context.setdefault("storage_lock", asyncio.Lock())
+    async with lock:
+        return await asyncio.to_thread(call)
+
+
+def create_entity_loader(context: dict) -> DataLoader[str, Optional[Entity]]:
+    """Create a loader that fetches entities by ID with one storage query per batch."""
+
+    async def load_entities(keys: list[str]) -> list[Optional[Entity]]:
+        entities = await call_storage(context, lambda: context["storage"].get_entities_by_ids(keys))
+        return [entities.get(key) for key in keys]
+
+    return DataLoader(load_fn=load_entities)
+
+
+def get_entity_loader(info: Info) -> DataLoader[str, Optional[Entity]]:
+    """Return the request's entity loader, creating it if the context has none yet."""
+    context = info.context
+    if "entity_loader" not in context:
+        context["entity_loader"] = create_entity_loader(context)
+    return context["entity_loader"]
+
+
+async def cached_read(info: Info, key: Hashable, read: Callable[[], T]) -> T:
+    """
+    Return the result of the storage call read(), reusing it if the same key was read earlier
+    in this request. The key must identify everything the read depends on, including the
+    columns it reads. The cache lives in the request context, so it is dropped when the request ends.
+    It holds the pending read, so resolvers running concurrently for the same key share it too.
+    """
+    cache = info.context.setdefault("read_cache", {})
+    if key not in cache:
+        cache[key] = asyncio.ensure_future(call_storage(info.context, read))
+    return await cache[key]
@@ -2,126 +2,31 @@
 Example GraphQL queries for the Knowledge Graph API.
 
 These queries are displayed in the GraphiQL interface to help users get started.
+The query text lives in query/examples/*.graphql and is only read the first time
+the GraphiQL page is rendered.
 """
 
-EXAMPLE_QUERIES = {
-    "Get Entity by ID": """# Retrieve a specific entity by its ID
-query GetEntity {
-  entity(id: "holmes:char:JohnWatson") {
-    entityId
-    name
-    entityType
-    synonyms
-    properties
-  }
-}""",
-    "Search Entities": """# Search for entities with pagination
-query SearchEntities {
-  entities(limit: 5, offset: 0) {
-    items {
-      entityId
-      name
-      entityType
-    }
-    total
-    limit
-    offset
-  }
-}""",
-    "Filter Entities": """# Filter entities by type and name
-query FilterEntities {
-  entities(
-    limit: 10
-    offset: 0
-    filter: {
-      entityType: "character"
-      nameContains: "Holmes"
-    }
-  ) {
-    items {
-      entityId
-      name
-      entityType
-      status
-    }
-    total
-    limit
-    offset
-  }
-}""",
-    "Find Relationships": """# Find relationships with pagination
-query FindRelationships {
-  relationships(
-    limit: 5
-    offset: 0
-    filter: {
-      predicate: "co_occurs_with"
-    }
-  ) {
-    items {
-      subjectId
-      predicate
-      objectId
-      confidence
-      sourceDocuments
-      properties
-    }
-    total
-    limit
-    offset
-  }
-}""",
-    "Filter Relationships by Subject": """# Find all relationships for a specific entity
-query FilterBySubject {
-  relationships(
-    limit: 5
-    offset: 0
-    filter: {
-      subjectId: "holmes:char:JohnWatson"
-    }
-  ) {
-    items {
-      subjectId
-      predicate
-      objectId
-    }
-    total
-    limit
-    offset
-  }
-}""",
-    "Multiple Queries": """# Get an entity and its relationships in one request
-query EntityWithRelationships {
-  entity(id: "holmes:char:JohnWatson") {
-    entityId
-    name
-    entityType
-  }
-  relationships(
-    limit: 5
-    offset: 0
-    filter: {
-      subjectId: "holmes:char:JohnWatson"
-    }
-  ) {
-    items {
-      subjectId
-      predicate
-      objectId
-    }
-    total
-  }
-}""",
-    "Bundle Info": """# Get bundle metadata for debugging and provenance
-query BundleInfo {
-  bundle {
-    bundleId
-    domain
-    createdAt
-    metadata
-  }
-}""",
+from functools import cache
+from pathlib import Path
+
+EXAMPLES_DIR = Path(__file__).parent / "examples"
+
+# Dropdown label -> file in EXAMPLES_DIR, in display order
+EXAMPLE_FILES = {
+    "Get Entity by ID": "get_entity.graphql",
+    "Search Entities": "search_entities.graphql",
+    "Filter Entities": "filter_entities.graphql",
+    "Find Relationships": "find_relationships.graphql",
+    "Filter Relationships by Subject": "filter_relationships_by_subject.graphql",
+    "Multiple Queries": "entity_with_relationships.graphql",
+    "Bundle Info": "bundle_info.graphql",
 }
 
-# Default query shown when GraphiQL first loads
-DEFAULT_QUERY = EXAMPLE_QUERIES["Search Entities"]
+# Example shown when GraphiQL first loads
+DEFAULT_EXAMPLE = "Search Entities"
+
+
+@cache
+def get_example_queries() -> dict[str, str]:
+    """Return the example queries keyed by dropdown label, reading them on first use."""
+    return {name: (EXAMPLES_DIR / filename).read_text(encoding="utf-8").rstrip("\n") for name, filename in EXAMPLE_FILES.items()}
@@ -0,0 +1,77 @@
+"""
+Limits on the size of GraphQL queries.
+
+Each list field is capped at MAX_LIMIT rows, but a query can alias or nest as many
+list fields as it likes. These schema extensions reject queries that are too deep
+or that could read too many rows in total, before any of them is executed.
+"""
+
+import os
+from graphql import FragmentDefinitionNode, GraphQLError, IntValueNode, OperationDefinitionNode, ValidationRule
+from strawberry.extensions import AddValidationRules, QueryDepthLimiter
+from .graphql_schema import MAX_LIMIT
+
+# Deepest selection nesting a query may use (configurable via environment variables)
+MAX_QUERY_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "5"))
+# Most rows a query may ask for, summed over all of its list fields
+MAX_QUERY_COST = int(os.getenv("GRAPHQL_MAX_COST", "10000"))
+
+
+class MaxQueryCostRule(ValidationRule):
+    """
+    Reject operations whose list fields (those taking a limit argument) could return
+    more than MAX_QUERY_COST rows in total. A field counts its limit, capped at
+    MAX_LIMIT; a limit passed in a variable counts as MAX_LIMIT. Fragments count once
+    for every place they are spread.
+    """
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.definition = None
+        self.costs = {}
+        self.spreads = {}
+
+    def _enter_definition(self, key) -> None:
+        self.definition = key
+        self.costs[key] = 0
+        self.spreads[key] = []
+
+    def enter_operation_definition(self, node: OperationDefinitionNode, *_args) -> None:
+        self._enter_definition(node)
+
+    def enter_fragment_definition(self, node: FragmentDefinitionNode, *_args) -> None:
+        self._enter_definition(node.name.value)
+
+    def enter_fragment_spread(self, node, *_args) -> None:
+        self.spreads[self.definition].append(node.name.value)
+
+    def enter_field(self, node, *_args) -> None:
+        field = self.context.get_field_def()
+        if field is None or "limit" not in field.args:
+            return
+        argument = next((argument for argument in node.arguments if argument.name.value == "limit"), None)
+        if argument is None:
+            limit = field.args["limit"].default_value
+        elif isinstance(argument.value, IntValueNode):
+            limit = int(argument.value.value)
+        else:
+            limit = MAX_LIMIT
+        self.costs[self.definition] += min(limit, MAX_LIMIT)
+
+    def _total_cost(self, key, seen: frozenset) -> int:
+        # Fragment cycles are reported by another rule; just don't follow them
+        if key in seen or key not in self.costs:
+            return 0
+        return self.costs[key] + sum(self._total_cost(fragment, seen | {key}) for fragment in self.spreads[key])
+
+    def leave_document(self, *_args) -> None:
+        for key in self.costs:
+            if isinstance(key, OperationDefinitionNode):
+                cost = self._total_cost(key, frozenset())
+                if cost > MAX_QUERY_COST:
+                    self.report_error(GraphQLError(f"Query could return {cost} rows, more than the maximum of {MAX_QUERY_COST}", key))
+
+
+def query_limit_extensions() -> list:
+    """Return the schema extensions that enforce MAX_QUERY_DEPTH and MAX_QUERY_COST."""
+    return [QueryDepthLimiter(max_depth=MAX_QUERY_DEPTH), AddValidationRules([MaxQueryCostRule])]
@@ -4,13 +4,19 @@ GraphQL schema for the Knowledge Graph API.
 This schema uses proper Strawberry types for type safety and better GraphQL introspection.
 """
 
+import base64
+import binascii
+import json
 import logging
 import os
 from datetime import datetime
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional
 import strawberry
 from strawberry.scalars import JSON
-from strawberry.types import Info
+from strawberry.types import Info, get_object_definition
+from strawberry.types.nodes import SelectedField
+from strawberry.utils.str_converters import to_camel_case
+from .dataloaders import cached_read, call_storage, get_entity_loader
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +26,10 @@ MAX_LIMIT = int(os.getenv("GRAPHQL_MAX_LIMIT", "100"))
 
 @strawberry.type
 class Entity:
-    """Generic entity GraphQL type."""
+    """Generic entity GraphQL type.
+
+    Resolvers return storage Entity models as they are; their attributes share these field names.
+    """
 
     entity_id: str = strawberry.field(name="entityId")
     entity_type: str = strawberry.field(name="entityType")
@@ -33,9 +42,42 @@ class Entity:
     properties: Optional[JSON] = None
 
 
+# Storage column behind each GraphQL field of Entity
+ENTITY_COLUMNS = {field.graphql_name or to_camel_case(field.python_name): field.python_name for field in get_object_definition(Entity, strict=True).fields}
+
+
+def selected_columns(selections: list, columns_by_field: dict[str, str]) -> list[str]:
+    """
+    Return the storage columns needed for the selected GraphQL fields, looking
+    through fragments. Fields with no column, such as __typename, are skipped.
+    """
+    columns = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            if selection.name in columns_by_field:
+                columns.append(columns_by_field[selection.name])
+        else:
+            columns.extend(selected_columns(selection.selections, columns_by_field))
+    return columns
+
+
+def page_item_selections(selections: list) -> list:
+    """Return what is selected on the items of a page type, looking through fragments."""
+    items = []
+    for selection in selections:
+        if not isinstance(selection, SelectedField):
+            items.extend(page_item_selections(selection.selections))
+        elif selection.name == "items":
+            items.extend(selection.selections)
+    return items
+
+
 @strawberry.type
 class Relationship:
-    """Generic relationship GraphQL type."""
+    """Generic relationship GraphQL type.
+
+    Resolvers return storage Relationship models as they are; their attributes share these field names.
+    """
 
     # Note: id field exists internally in the Relationship model but is not exposed in GraphQL schema.
     # It could be exposed if needed in the future by adding: id: strawberry.ID = strawberry.field(name="id")
@@ -46,15 +88,45 @@ class Relationship:
     source_documents: List[str] = strawberry.field(name="sourceDocuments", default_factory=list)
     properties: Optional[JSON] = None
 
+    @strawberry.field
+    async def subject(self, info: Info) -> Optional[Entity]:
+        """The subject entity, fetched in one batch with the other entities in the response."""
+        return await get_entity_loader(info).load(self.subject_id)
+
+    @strawberry.field(name="object")
+    async def object_(self, info: Info) -> Optional[Entity]:
+        """The object entity, fetched in one batch with the other entities in the response."""
+        return await get_entity_loader(info).load(self.object_id)
+
+
+# Storage column behind each GraphQL field of Relationship; the nested entities need their IDs
+RELATIONSHIP_COLUMNS = {
+    field.graphql_name or to_camel_case(field.python_name): field.python_name for field in get_object_definition(Relationship, strict=True).fields if field.base_resolver is None
+} | {"subject": "subject_id", "object": "object_id"}
+
+
+@strawberry.type
+class PageInfo:
+    """Cursor for fetching the next page with the `after` argument."""
+
+    end_cursor: Optional[str] = strawberry.field(name="endCursor", default=None)
+    has_next_page: bool = strawberry.field(name="hasNextPage", default=False)
+
 
 @strawberry.type
 class EntityPage:
     """Paginated result for entities."""
 
     items: List[Entity]
-    total: int
     limit: int
     offset: int
+    page_info: PageInfo = strawberry.field(name="pageInfo")
+    count: strawberry.Private[Callable[[], Awaitable[int]]]
+
+    @strawberry.field
+    async def total(self) -> int:
+        """Number of entities matching the filter; only counted if the query selects it."""
+        return await self.count()
 
 
 @strawberry.type
@@ -62,9 +134,31 @@ class RelationshipPage:
     """Paginated result for relationships."""
 
     items: List[Relationship]
-    total: int
     limit: int
     offset: int
+    page_info: PageInfo = strawberry.field(name="pageInfo")
+    count: strawberry.Private[Callable[[], Awaitable[int]]]
+
+    @strawberry.field
+    async def total(self) -> int:
+        """Number of relationships matching the filter; only counted if the query selects it."""
+        return await self.count()
+
+
+def encode_cursor(key: list[str]) -> str:
+    """Encode the sort key of the last item on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[str]:
+    """Decode a cursor made by encode_cursor, checking it holds a key of the given size."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        key = None
+    if not isinstance(key, list) or len(key) != size or not all(isinstance(part, str) for part in key):
+        raise ValueError("Invalid cursor")
+    return key
 
 
 @strawberry.input
@@ -74,6 +168,7 @@ class EntityFilter:
     entity_type: Optional[str] = None
     name: Optional[str] = None  # exact match
     name_contains: Optional[str] = None  # ILIKE %...% (PostgreSQL) or LIKE %...% (SQLite)
+    name_starts_with: Optional[str] = None  # case-sensitive prefix match, served from the name index
     source: Optional[str] = None
     status: Optional[str] = None
 
@@ -100,33 +195,28 @@ class BundleInfo:
 @strawberry.type
 class Query:
     @strawberry.field
-    def entity(self, info: Info, id: str) -> Optional[Entity]:  # pylint: disable=redefined-builtin
+    async def entity(self, info: Info, id: str) -> Optional[Entity]:  # pylint: disable=redefined-builtin
         """Retrieve a single entity by its ID."""
         storage = info.context["storage"]
-        entity_model = storage.get_entity(entity_id=id)
-        if entity_model:
-            return Entity(
-                entity_id=entity_model.entity_id,
-                entity_type=entity_model.entity_type,
-                name=entity_model.name,
-                status=entity_model.status,
-                confidence=entity_model.confidence,
-                usage_count=entity_model.usage_count,
-                source=entity_model.source,
-                synonyms=entity_model.synonyms,
-                properties=entity_model.properties,
-            )
-        return None
+        # Leave wide columns such as properties unread unless the query selects them.
+        # The columns are part of the cache key, so a lookup that selects other fields reads its own.
+        columns = tuple(sorted(set(selected_columns(info.selected_fields[0].selections, ENTITY_COLUMNS))))
+        return await cached_read(info, ("entity", id, columns), lambda: storage.get_entity(entity_id=id, columns=columns))
 
     @strawberry.field
-    def entities(
+    async def entities(
         self,
         info: Info,
         limit: int = 100,
         offset: int = 0,
         filter: Optional[EntityFilter] = None,  # pylint: disable=redefined-builtin
+        after: Optional[str] = None,
     ) -> EntityPage:
-        """List entities with pagination and optional filtering."""
+        """List entities with pagination and optional filtering.
+
+        Pass the previous page's pageInfo.endCursor as `after` to page by keyset
+        rather than by offset, which stays fast however deep the page is.
+        """
         # Enforce max limit
         if limit > MAX_LIMIT:
             logger.warning("Requested limit %d exceeds MAX_LIMIT %d, capping to %d", limit, MAX_LIMIT, MAX_LIMIT)
@@ -139,48 +229,53 @@ class Query:
         entity_type = filter_obj.entity_type if filter_obj else None
         name = filter_obj.name if filter_obj else None
         name_contains = filter_obj.name_contains if filter_obj else None
+        name_startswith = filter_obj.name_starts_with if filter_obj else None
         source = filter_obj.source if filter_obj else None
         status = filter_obj.status if filter_obj else None
 
-        # Get total count
-        total = storage.count_entities(
-            entity_type=entity_type,
-            name=name,
-            name_contains=name_contains,
-            source=source,
-            status=status,
-        )
+        # Counted only if the query selects total
+        async def count() -> int:
+            return await call_storage(
+                info.context,
+                lambda: storage.count_entities(
+                    entity_type=entity_type,
+                    name=name,
+                    name_contains=name_contains,
+                    name_startswith=name_startswith,
+                    source=source,
+                    status=status,
+                ),
+            )
 
-        # Get paginated results
-        entity_models = storage.get_entities(
-            limit=limit,
-            offset=offset,
-            entity_type=entity_type,
-            name=name,
-            name_contains=name_contains,
-            source=source,
-            status=status,
+        # Get paginated results, plus one more row to tell whether there is a next page
+        # Read only the columns behind the selected item fields, plus the ID for the cursor
+        item_selections = page_item_selections(info.selected_fields[0].selections)
+        columns = sorted({"entity_id", *selected_columns(item_selections, ENTITY_COLUMNS)})
+        after_id = decode_cursor(after, 1)[0] if after else None
+        entity_models = await call_storage(
+            info.context,
+            lambda: storage.get_entities(
+                limit=limit + 1,
+                offset=offset,
+                entity_type=entity_type,
+                name=name,
+                name_contains=name_contains,
+                name_startswith=name_startswith,
+                source=source,
+                status=status,
+                after=after_id,
+                columns=columns,
+            ),
         )
+        has_next_page = len(entity_models) > limit
+        entity_models = entity_models[:limit]
+        end_cursor = encode_cursor([entity_models[-1].entity_id]) if entity_models else None
 
-        items = [
-            Entity(
-                entity_id=e.entity_id,
-                entity_type=e.entity_type,
-                name=e.name,
-                status=e.status,
-                confidence=e.confidence,
-                usage_count=e.usage_count,
-                source=e.source,
-                synonyms=e.synonyms,
-                properties=e.properties,
-            )
-            for e in entity_models
-        ]
-
-        return EntityPage(items=items, total=total, limit=limit, offset=offset)
+        page_info = PageInfo(end_cursor=end_cursor, has_next_page=has_next_page)
+        return EntityPage(items=entity_models, count=count, limit=limit, offset=offset, page_info=page_info)
 
     @strawberry.field
-    def relationship(
+    async def relationship(
         self,
         info: Info,
         subject_id: str,
@@ -189,31 +284,26 @@ class Query:
     ) -> Optional[Relationship]:
         """Retrieve a single relationship by its triple."""
         storage = info.context["storage"]
-        relationship_model = storage.get_relationship(
-            subject_id=subject_id,
-            predicate=predicate,
-            object_id=object_id,
+        return await cached_read(
+            info,
+            ("relationship", subject_id, predicate, object_id),
+            lambda: storage.get_relationship(subject_id=subject_id, predicate=predicate, object_id=object_id),
         )
-        if relationship_model:
-            return Relationship(
-                subject_id=relationship_model.subject_id,
-                predicate=relationship_model.predicate,
-                object_id=relationship_model.object_id,
-                confidence=relationship_model.confidence,
-                source_documents=relationship_model.source_documents,
-                properties=relationship_model.properties,
-            )
-        return None
 
     @strawberry.field
-    def relationships(
+    async def relationships(
         self,
         info: Info,
         limit: int = 100,
         offset: int = 0,
         filter: Optional[RelationshipFilter] = None,  # pylint: disable=redefined-builtin
+        after: Optional[str] = None,
     ) -> RelationshipPage:
-        """Find relationships with pagination and optional filtering."""
+        """Find relationships with pagination and optional filtering.
+
+        Pass the previous page's pageInfo.endCursor as `after` to page by keyset
+        rather than by offset, which stays fast however deep the page is.
+        """
         # Enforce max limit
         if limit > MAX_LIMIT:
             logger.warning("Requested limit %d exceeds MAX_LIMIT %d, capping to %d", limit, MAX_LIMIT, MAX_LIMIT)
@@ -227,41 +317,47 @@ class Query:
         object_id = filter_obj.object_id if filter_obj else None
         predicate = filter_obj.predicate if filter_obj else None
 
-        # Get total count
-        total = storage.count_relationships(
-            subject_id=subject_id,
-            object_id=object_id,
-            predicate=predicate,
-        )
+        # Counted only if the query selects total
+        async def count() -> int:
+            return await call_storage(
+                info.context,
+                lambda: storage.count_relationships(
+                    subject_id=subject_id,
+                    object_id=object_id,
+                    predicate=predicate,
+                ),
+            )
 
-        # Get paginated results
-        relationship_models = storage.find_relationships(
-            subject_id=subject_id,
-            predicate=predicate,
-            object_id=object_id,
-            limit=limit,
-            offset=offset,
+        # Get paginated results, plus one more row to tell whether there is a next page
+        # Read only the columns behind the selected item fields, plus the triple for the cursor
+        item_selections = page_item_selections(info.selected_fields[0].selections)
+        columns = sorted({"subject_id", "predicate", "object_id", *selected_columns(item_selections, RELATIONSHIP_COLUMNS)})
+        after_key = tuple(decode_cursor(after, 3)) if after else None
+        relationship_models = await call_storage(
+            info.context,
+            lambda: storage.find_relationships(
+                subject_id=subject_id,
+                predicate=predicate,
+                object_id=object_id,
+                limit=limit + 1,
+                offset=offset,
+                after=after_key,
+                columns=columns,
+            ),
         )
+        has_next_page = len(relationship_models) > limit
+        relationship_models = relationship_models[:limit]
+        last = relationship_models[-1] if relationship_models else None
+        end_cursor = encode_cursor([last.subject_id, last.predicate, last.object_id]) if last else None
 
-        items = [
-            Relationship(
-                subject_id=r.subject_id,
-                predicate=r.predicate,
-                object_id=r.object_id,
-                confidence=r.confidence,
-                source_documents=r.source_documents,
-                properties=r.properties,
-            )
-            for r in relationship_models
-        ]
-
-        return RelationshipPage(items=items, total=total, limit=limit, offset=offset)
+        page_info = PageInfo(end_cursor=end_cursor, has_next_page=has_next_page)
+        return RelationshipPage(items=relationship_models, count=count, limit=limit, offset=offset, page_info=page_info)
 
     @strawberry.field
-    def bundle(self, info: Info) -> Optional[BundleInfo]:
+    async def bundle(self, info: Info) -> Optional[BundleInfo]:
         """Get bundle metadata for debugging and provenance."""
         storage = info.context["storage"]
-        bundle_model = storage.get_bundle_info()
+        bundle_model = await call_storage(info.context, storage.get_bundle_info)
 
         if bundle_model:
             # Try to get metadata from bundle manifest if available
@@ -4,19 +4,24 @@ Custom GraphiQL interface with example queries.
 Serves a custom GraphiQL HTML page with a dropdown menu of example queries.
 """
 
+from functools import cache
+
 from fastapi import APIRouter
 from fastapi.responses import HTMLResponse
 import json
 
-from ..graphql_examples import EXAMPLE_QUERIES, DEFAULT_QUERY
+from ..graphql_examples import DEFAULT_EXAMPLE, get_example_queries
 
 router = APIRouter()
 
 
+@cache
 def create_graphiql_html(graphql_endpoint: str = "/graphql") -> str:
     """
     Create custom GraphiQL HTML with example queries dropdown.
 
+    The page is static, so it is built once per endpoint and reused.
+
     Attributes:
 
         graphql_endpoint: The GraphQL endpoint URL
@@ -24,7 +29,8 @@ def create_graphiql_html(graphql_endpoint: str = "/graphql") -> str:
     Returns: HTML string for the GraphiQL interface
     """
     # Convert example queries to JavaScript format
-    examples_js = json.dumps(EXAMPLE_QUERIES, indent=2)
+    example_queries = get_example_queries()
+    examples_js = json.dumps(example_queries, indent=2)
 
     return f"""<!DOCTYPE html>
 <html>
@@ -94,7 +100,7 @@ def create_graphiql_html(graphql_endpoint: str = "/graphql") -> str:
 
         // GraphiQL component with state management
         function GraphiQLWithExamples() {{
-            const [query, setQuery] = useState(`{DEFAULT_QUERY.replace("`", "`")}`);
+            const [query, setQuery] = useState(`{example_queries[DEFAULT_EXAMPLE].replace("`", "`")}`);
 
             // Expose setQuery to window for dropdown access
             React.useEffect(() => {{
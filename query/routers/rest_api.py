@@ -5,6 +5,7 @@ REST API router for the Medical Literature Knowledge Graph.
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from storage.models.entity import Entity
 from storage.models.relationship import Relationship
 from storage.interfaces import StorageInterface
@@ -13,13 +14,29 @@ from ..storage_factory import get_storage
 
 router = APIRouter(prefix="/api/v1")
 
+# The handlers are plain functions because storage calls block: FastAPI runs them in its
+# thread pool, so concurrent requests overlap their database I/O instead of stalling the event loop.
+
+# Fields written for each row of a list response, in model order
+ENTITY_FIELDS = tuple(Entity.__table__.columns.keys())
+RELATIONSHIP_FIELDS = tuple(Relationship.__table__.columns.keys())
+
+
+def _rows_response(rows, fields: tuple[str, ...]) -> ORJSONResponse:
+    """
+    Encode storage rows straight to JSON with orjson. The rows already are the response
+    models, so this skips FastAPI validating and serializing them a second time;
+    response_model still documents the shape, and the tests check the rows match it.
+    """
+    return ORJSONResponse([{field: getattr(row, field) for field in fields} for row in rows])
+
 
 @router.get(
     "/entities/{entity_id}",
     response_model=Entity,
     summary="Get a single entity by its canonical ID",
 )
-async def get_entity_by_id(entity_id: str, storage: StorageInterface = Depends(get_storage)):
+def get_entity_by_id(entity_id: str, storage: StorageInterface = Depends(get_storage)):
     """
     Retrieve a single medical entity (e.g., Disease, Gene, Drug) by its
     canonical identifier (e.g., UMLS ID, HGNC ID).
@@ -33,24 +50,26 @@ async def get_entity_by_id(entity_id: str, storage: StorageInterface = Depends(g
 @router.get(
     "/entities",
     response_model=List[Entity],
+    response_class=ORJSONResponse,
     summary="List all entities",
 )
-async def list_entities(limit: int = 100, offset: int = 0, storage: StorageInterface = Depends(get_storage)):
+def list_entities(limit: int = 100, offset: int = 0, storage: StorageInterface = Depends(get_storage)):
     """
     List all medical entities in the knowledge graph.
 
     - **limit**: Maximum number of entities to return.
     - **offset**: Number of entities to skip for pagination.
     """
-    return storage.get_entities(limit=limit, offset=offset)
+    return _rows_response(storage.get_entities(limit=limit, offset=offset), ENTITY_FIELDS)
 
 
 @router.get(
     "/relationships",
     response_model=List[Relationship],
+    response_class=ORJSONResponse,
     summary="Find relationships between entities",
 )
-async def find_relationships(
+def find_relationships(
     subject_id: Optional[str] = None,
     predicate: Optional[str] = None,
     object_id: Optional[str] = None,
@@ -71,4 +90,4 @@ async def find_relationships(
         object_id=object_id,
         limit=limit,
     )
-    return relationships
+    return _rows_response(relationships, RELATIONSHIP_FIELDS)
@@ -5,6 +5,7 @@ from pathlib import Path
 from fastapi import FastAPI, Depends
 from fastapi.staticfiles import StaticFiles
 import strawberry
+from strawberry.extensions import ParserCache, ValidationCache
 from strawberry.fastapi import GraphQLRouter
 
 from .storage_factory import close_storage, get_engine, get_storage
@@ -12,6 +13,8 @@ from .bundle_loader import load_bundle_at_startup
 from .routers import rest_api
 from .routers import graphiql_custom
 from .graphql_schema import Query
+from .graphql_limits import query_limit_extensions
+from .dataloaders import create_entity_loader
 from storage.interfaces import StorageInterface
 
 # Let's take this opportunity to do the mkdocs build
@@ -49,13 +52,18 @@ app.include_router(rest_api.router)
 async def get_context(
     storage: StorageInterface = Depends(get_storage),
 ):
-    return {
-        "storage": storage,
-    }
+    context = {"storage": storage, "read_cache": {}}
+    context["entity_loader"] = create_entity_loader(context)
+    return context
 
 
 # Mount GraphQL with context (no built-in GraphiQL)
-graphql_schema = strawberry.Schema(query=Query)
+# Clients such as the GraphiQL examples send the same query text over and over;
+# cache parsed and validated documents so only the first request pays for them
+graphql_schema = strawberry.Schema(
+    query=Query,
+    extensions=[*query_limit_extensions(), ParserCache(maxsize=1024), ValidationCache(maxsize=1024)],
+)
 graphql_app = GraphQLRouter(
     graphql_schema,
     graphiql=False,  # Disable built-in GraphiQL
@@ -2,18 +2,39 @@
 Storage factory for creating and managing storage backend instances.
 """
 
+import logging
 import os
 from typing import Generator
 from sqlalchemy import create_engine
-from sqlmodel import Session
-from storage.backends.postgres import PostgresStorage
-from storage.backends.sqlite import SQLiteStorage
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel
+from storage.backends.json_columns import JSON_ENGINE_ARGS
+from storage.backends.postgres import COPY_DRIVERS, PostgresStorage
+from storage.backends.sqlite import SQLiteStorage, configure_engine as configure_sqlite_engine
 from storage.interfaces import StorageInterface
 
+logger = logging.getLogger(__name__)
+
 # Singleton engine and db_url
 _engine = None
 _db_url = None
 
+# Storage backend for each database URL's backend name, i.e. its scheme without any "+driver"
+_BACKENDS: dict[str, type[StorageInterface]] = {"postgresql": PostgresStorage, "sqlite": SQLiteStorage}
+
+
+def _backend_for(db_url: str) -> type[StorageInterface]:
+    """Return the storage backend class for a database URL."""
+    url = make_url(db_url)
+    backend = _BACKENDS.get(url.get_backend_name())
+    if backend is None:
+        raise ValueError("Unsupported database URL scheme.")
+    # Bundles are loaded into PostgreSQL with COPY, which only some drivers support
+    if backend is PostgresStorage and url.get_driver_name() not in COPY_DRIVERS:
+        raise ValueError(f"Unsupported PostgreSQL driver {url.get_driver_name()!r}; use one of {', '.join(sorted(COPY_DRIVERS))}.")
+    return backend
+
 
 def get_engine():
     """
@@ -23,14 +44,38 @@ def get_engine():
     if _engine is None:
         _db_url = os.getenv("DATABASE_URL")
         if not _db_url:
-            print("DATABASE_URL not set, defaulting to SQLite in-memory database.")
             _db_url = "sqlite:///./test.db"  # Default to SQLite file for simplicity
+            logger.info("DATABASE_URL not set, defaulting to SQLite database %s", _db_url)
+        # Fail on an unsupported scheme before create_engine tries to import its driver
+        _backend_for(_db_url)
+        url = make_url(_db_url)
+        is_sqlite = url.get_backend_name() == "sqlite"
 
         connect_args = {}
-        if _db_url.startswith("sqlite://"):
+        engine_args = dict(JSON_ENGINE_ARGS)
+        # Compiled statements kept per engine. List queries vary by filter combination and
+        # selected columns, which can outgrow SQLAlchemy's default of 500 entries.
+        engine_args["query_cache_size"] = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+        if is_sqlite:
             connect_args["check_same_thread"] = False  # Needed for SQLite with FastAPI
+            if url.database in (None, "", ":memory:"):
+                # Each connection to :memory: is a separate database, so every thread must share one
+                engine_args["poolclass"] = StaticPool
+        else:
+            # Sized for requests served concurrently from FastAPI's thread pool
+            engine_args["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+            engine_args["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "15"))
+            engine_args["pool_timeout"] = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+            # Replace connections before server-side idle timeouts can drop them, and check
+            # each one on checkout so a dropped connection is replaced instead of failing a request
+            engine_args["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+            engine_args["pool_pre_ping"] = True
 
-        _engine = create_engine(_db_url, connect_args=connect_args)
+        _engine = create_engine(_db_url, connect_args=connect_args, **engine_args)
+        if is_sqlite:
+            configure_sqlite_engine(_engine)
+            # Requests share this engine, so create the tables here rather than per request
+            SQLModel.metadata.create_all(_engine)
     return _engine, _db_url
 
 
@@ -40,31 +85,19 @@ def get_storage() -> Generator[StorageInterface, None, None]:
     """
     engine, db_url = get_engine()  # Get both engine and db_url
 
-    if db_url.startswith("postgresql://"):
-        with Session(engine) as session:
-            try:
-                storage: StorageInterface = PostgresStorage(session)
-                yield storage
-                session.commit()
-            except Exception:
-                session.rollback()
-                raise
-    elif db_url.startswith("sqlite://"):
-        # SQLiteStorage manages its own engine/session, so we instantiate it directly.
-        # It's important to pass the actual file path or ":memory:".
-        db_path = db_url.replace("sqlite:///", "")  # Remove prefix to get path
-        if not db_path:  # Handle in-memory or relative path cases
-            db_path = ":memory:" if db_url == "sqlite:///:memory:" else "./test.db"
-
-        storage: StorageInterface = SQLiteStorage(db_path)
+    backend = _backend_for(db_url)
+
+    # Both backends share the engine's connection pool; only the session is per request.
+    # Request handlers only read, so there is never pending state to flush before a query,
+    # and nothing needs expiring when the request's transaction ends.
+    with Session(engine, autoflush=False, expire_on_commit=False) as session:
         try:
+            storage: StorageInterface = backend(session=session)
             yield storage
-            # SQLiteStorage commits internally on operations or doesn't need explicit commit here
-            # for read-only usage, but we ensure it's closed.
-        finally:
-            storage.close()  # Ensure SQLite connection is closed
-    else:
-        raise ValueError("Unsupported database URL scheme.")
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
 
 
 def close_storage():
@@ -8,6 +8,7 @@ Available Backends:
 
 - **sqlite**: SQLite implementation for testing and development
 - **postgres**: PostgreSQL+pgvector implementation for production
+- **common**, **bundle_reader**, **json_columns**: code shared by both
 - **sqlite_entity_collection**: SQLite-based entity collection
 
 Example:
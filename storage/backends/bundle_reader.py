@@ -0,0 +1,69 @@
+"""
+Reading JSONL bundle files for the storage backends' load_bundle.
+"""
+
+import gzip
+import queue
+import threading
+from typing import IO, Callable, Iterator, TypeVar
+import orjson
+
+T = TypeVar("T")
+
+# Parsed batches that may wait for the database at once; bounds the parser thread's lead
+PARSE_QUEUE_DEPTH = 4
+
+
+def open_bundle_file(path: str) -> IO[bytes]:
+    """Open a JSONL bundle file for reading as bytes, decompressing it if it is gzipped."""
+    # orjson decodes UTF-8 itself, so there is no need for a text-mode decode pass
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def parse_batches_in_background(path: str, make_row: Callable[[dict], T], batch_size: int) -> Iterator[list[T]]:
+    """
+    Yield the rows of a JSONL bundle file in batches of batch_size, each line turned into a
+    row by make_row. The file is parsed on a worker thread up to PARSE_QUEUE_DEPTH batches
+    ahead, so parsing overlaps with writing to the database. Parse errors are re-raised in
+    the caller.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=PARSE_QUEUE_DEPTH)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Give up if the consumer has gone away, rather than blocking on a full queue forever
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def parse() -> None:
+        try:
+            batch = []
+            with open_bundle_file(path) as f:
+                for line in f:
+                    batch.append(make_row(orjson.loads(line)))
+                    if len(batch) >= batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+            if batch and not put(batch):
+                return
+            put(done)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            put(e)
+
+    parser = threading.Thread(target=parse, name=f"parse {path}", daemon=True)
+    parser.start()
+    try:
+        while (item := batches.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        parser.join()
@@ -0,0 +1,304 @@
+"""
+Code shared by the SQLite and PostgreSQL storage backends: bundle row normalization,
+the find_relationships statements, the read caches, and the storage methods that are
+the same for both dialects.
+"""
+
+import threading
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Hashable
+from functools import cache
+from typing import Optional, Sequence
+from sqlalchemy import Index, Table, bindparam, func, inspect, lambda_stmt, tuple_
+from sqlalchemy.orm import load_only
+from sqlmodel import Session, select
+from storage.interfaces import StorageInterface
+from storage.models import Bundle, Entity, Relationship
+from query.bundle import BundleManifestV1
+
+# Bundle rows are written in batches of this size, bypassing the ORM
+BULK_BATCH_SIZE = 10_000
+
+# Bundle files at least this large are loaded with the table's secondary indexes dropped
+# and rebuilt afterwards. Below it, rebuilding over rows already in the table can cost
+# more than updating the indexes as rows arrive.
+REBUILD_INDEXES_MIN_BYTES = 16 * 1024 * 1024
+
+# Columns of the uq_relationship constraint, which identify a relationship
+RELATIONSHIP_KEY = ("subject_id", "object_id", "predicate")
+
+# Column values used when a bundle row leaves them out
+ENTITY_DEFAULTS = {column: None for column in Entity.__table__.columns.keys()} | {"synonyms": [], "properties": {}}
+RELATIONSHIP_DEFAULTS = {column: None for column in Relationship.__table__.columns.keys() if column != "id"} | {"source_documents": [], "properties": {}}
+
+# Entity metadata fields that become top-level fields when the row doesn't set them.
+# Rows are parsed fresh from JSON and only model columns are read from them, so the
+# normalizers below work in place and leave any other keys alone.
+ENTITY_METADATA_FIELDS = ("status", "usage_count", "source", "created_at")
+
+# Exact counts are cached per database and filter combination for this many seconds.
+# Loading a bundle or clearing the tables drops the cache, but only in the process that
+# did it: other worker processes on the same database keep serving their cached counts
+# and bundle record, stale, until their entries expire, up to COUNT_CACHE_TTL later.
+COUNT_CACHE_TTL = 60.0
+COUNT_CACHE_SIZE = 256
+
+_count_cache: OrderedDict[tuple, tuple[float, int]] = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+# The latest bundle record per database, as column values or None, cached under the same lock and TTL as counts
+_bundle_info_cache: dict[Hashable, tuple[float, Optional[dict]]] = {}
+
+
+def clear_read_caches() -> None:
+    """Drop every cached count and bundle record."""
+    with _count_cache_lock:
+        _count_cache.clear()
+        _bundle_info_cache.clear()
+
+
+def normalize_entity(data: dict) -> dict:
+    """
+    Flatten an entity row's metadata into top-level fields, in place.
+    The whole of the metadata is also merged into properties.
+    """
+    meta = data.get("metadata")
+    if isinstance(meta, dict):
+        for key in ENTITY_METADATA_FIELDS:
+            if key in meta and key not in data:
+                data[key] = meta[key]
+        if meta:
+            data.setdefault("properties", {}).update(meta)
+    return data
+
+
+def normalize_relationship(data: dict) -> dict:
+    """
+    Map a relationship row's older field names onto the model's, in place,
+    and move its metadata into properties.
+    """
+    if "source_entity_id" in data and "subject_id" not in data:
+        data["subject_id"] = data.pop("source_entity_id")
+    if "target_entity_id" in data and "object_id" not in data:
+        data["object_id"] = data.pop("target_entity_id")
+    meta = data.get("metadata")
+    if isinstance(meta, dict):
+        if "source_documents" in meta and "source_documents" not in data:
+            data["source_documents"] = meta.pop("source_documents")
+        data.setdefault("properties", {}).update(meta)
+    return data
+
+
+# Bits of the find_relationships filter mask
+FILTER_SUBJECT, FILTER_PREDICATE, FILTER_OBJECT, FILTER_AFTER, FILTER_LIMIT = 1, 2, 4, 8, 16
+
+
+@cache
+def relationship_statement(mask: int, columns: tuple[str, ...] = ()):
+    """
+    Build the find_relationships query for one combination of FILTER_* bits, with every
+    value as a named bind parameter, reading only the given columns if any. Each variant
+    is built once and reused, so SQLAlchemy never rebuilds the statement or recompiles it.
+    """
+    statement = select(Relationship)
+    if columns:
+        statement = statement.options(load_only(*(getattr(Relationship, column) for column in columns)))
+    if mask & FILTER_SUBJECT:
+        statement = statement.where(Relationship.subject_id == bindparam("subject_id"))
+    if mask & FILTER_PREDICATE:
+        statement = statement.where(Relationship.predicate == bindparam("predicate"))
+    if mask & FILTER_OBJECT:
+        statement = statement.where(Relationship.object_id == bindparam("object_id"))
+    # Sort in the column order of the uq_relationship index so the database can walk it
+    sort_key = tuple_(Relationship.subject_id, Relationship.object_id, Relationship.predicate)
+    if mask & FILTER_AFTER:
+        statement = statement.where(sort_key > tuple_(bindparam("after_subject_id"), bindparam("after_object_id"), bindparam("after_predicate")))
+    statement = statement.order_by(Relationship.subject_id, Relationship.object_id, Relationship.predicate)
+    if mask & FILTER_LIMIT:
+        statement = statement.limit(bindparam("limit"))
+    return statement.offset(bindparam("offset"))
+
+
+def relationship_count_statement(subject_id: Optional[str], predicate: Optional[str], object_id: Optional[str]):
+    """Build the count_relationships query for the given filters."""
+    statement = select(func.count(Relationship.id))  # pylint: disable=not-callable
+    if subject_id:
+        statement = statement.where(Relationship.subject_id == subject_id)
+    if predicate:
+        statement = statement.where(Relationship.predicate == predicate)
+    if object_id:
+        statement = statement.where(Relationship.object_id == object_id)
+    return statement
+
+
+class SessionStorage(StorageInterface):
+    """
+    The parts of a storage backend that work the same on any database reached through
+    a SQLModel session. Subclasses add loading, entity queries and counts.
+    """
+
+    _session: Session
+
+    @abstractmethod
+    def _cache_scope(self) -> Optional[Hashable]:
+        """
+        Return what identifies this storage's database in the read caches,
+        or None if its reads must not be cached.
+        """
+
+    def _drop_secondary_indexes(self, table: Table) -> list[Index]:
+        """
+        Drop the non-unique indexes of table, so a bulk load doesn't update them row by row.
+        Returns the dropped indexes for _recreate_indexes.
+        """
+        connection = self._session.connection()
+        indexes = [index for index in table.indexes if not index.unique]
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        return indexes
+
+    def _recreate_indexes(self, indexes: list[Index]) -> None:
+        """Build indexes dropped by _drop_secondary_indexes again, each in a single pass."""
+        connection = self._session.connection()
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+
+    def _fetch_all(self, statement, params: dict, stream: bool = False) -> Sequence:
+        """Run a query and return all of its rows. stream says the result may be large."""
+        return self._session.exec(statement, params=params).all()
+
+    def _cached_count(self, key: tuple, statement) -> int:
+        """Run a count statement, reusing a recent result for the same key and database."""
+        scope = self._cache_scope()
+        if scope is None:
+            return self._session.exec(statement).one()
+        key = (scope, *key)
+        now = time.monotonic()
+        with _count_cache_lock:
+            cached = _count_cache.get(key)
+            if cached is not None and now - cached[0] < COUNT_CACHE_TTL:
+                _count_cache.move_to_end(key)
+                return cached[1]
+        count = self._session.exec(statement).one()
+        with _count_cache_lock:
+            _count_cache[key] = (now, count)
+            _count_cache.move_to_end(key)
+            while len(_count_cache) > COUNT_CACHE_SIZE:
+                _count_cache.popitem(last=False)
+        return count
+
+    def is_bundle_loaded(self, bundle_id: str) -> bool:
+        """
+        Check if a bundle with the given ID is already loaded.
+        """
+        bundle = self._session.get(Bundle, bundle_id)
+        return bundle is not None
+
+    def prepare_reload(self, bundle_id: str, force: bool = False) -> bool:
+        """
+        Get ready to load the bundle with the given ID.
+        If force is set, all loaded data is cleared first.
+        Returns True if the bundle should be loaded.
+        """
+        if not force:
+            return not self.is_bundle_loaded(bundle_id)
+        self.truncate_all()
+        return True
+
+    def record_bundle(self, bundle_manifest: BundleManifestV1) -> None:
+        """
+        Record that a bundle has been loaded.
+        """
+        bundle = Bundle(
+            bundle_id=bundle_manifest.bundle_id,
+            domain=bundle_manifest.domain,
+            created_at=bundle_manifest.created_at,
+            bundle_version=bundle_manifest.get_version_str(),
+        )
+        self._session.add(bundle)
+
+    def get_entity(self, entity_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Entity]:
+        """
+        Get an entity by its ID.
+        If columns is given, only those columns are read; any other is loaded on first access.
+        An entity already in the session with some of the columns unread has just those read,
+        so the caller can use every column it asked for without the session loading it later.
+        """
+        options = [load_only(*(getattr(Entity, column) for column in columns))] if columns else None
+        entity = self._session.get(Entity, entity_id, options=options)
+        if entity is not None:
+            unloaded = inspect(entity).unloaded
+            missing = [column for column in columns or Entity.__table__.columns.keys() if column in unloaded]
+            if missing:
+                self._session.refresh(entity, attribute_names=missing)
+        return entity
+
+    def find_relationships(
+        self,
+        subject_id: Optional[str] = None,
+        predicate: Optional[str] = None,
+        object_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        after: Optional[tuple[str, str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Sequence[Relationship]:
+        """
+        Find relationships matching criteria, in a stable order.
+        If after is the (subject_id, predicate, object_id) triple of a relationship,
+        only relationships that sort after it are returned (keyset pagination).
+        If columns is given, only those columns are read; any other is loaded on first access.
+        """
+        mask = (FILTER_SUBJECT if subject_id else 0) | (FILTER_PREDICATE if predicate else 0) | (FILTER_OBJECT if object_id else 0) | (FILTER_AFTER if after else 0) | (FILTER_LIMIT if limit else 0)
+        params = {"subject_id": subject_id, "predicate": predicate, "object_id": object_id, "limit": limit, "offset": offset or 0}
+        if after:
+            params["after_subject_id"], params["after_predicate"], params["after_object_id"] = after
+        return self._fetch_all(relationship_statement(mask, tuple(columns or ())), params, stream=not limit)
+
+    def get_relationship(self, subject_id: str, predicate: str, object_id: str) -> Optional[Relationship]:
+        """
+        Get a relationship by its canonical triple (subject_id, predicate, object_id).
+        """
+        statement = lambda_stmt(
+            lambda: select(Relationship).where(
+                Relationship.subject_id == subject_id,
+                Relationship.predicate == predicate,
+                Relationship.object_id == object_id,
+            )
+        )
+        return self._session.exec(statement).scalars().first()
+
+    def get_relationships(self, limit: int = 100, offset: int = 0) -> Sequence[Relationship]:
+        """
+        List all relationships.
+        """
+        statement = select(Relationship).limit(limit).offset(offset)
+        return self._session.exec(statement).all()
+
+    def get_bundle_info(self):
+        """
+        Get bundle metadata (latest bundle).
+        Returns None if no bundle is loaded.
+        A recently read bundle is served from the cache as a new, detached Bundle, so after
+        another process reloads the data this can lag by up to COUNT_CACHE_TTL seconds.
+        """
+        scope = self._cache_scope()
+        now = time.monotonic()
+        if scope is not None:
+            with _count_cache_lock:
+                cached = _bundle_info_cache.get(scope)
+            if cached is not None and now - cached[0] < COUNT_CACHE_TTL:
+                return Bundle(**cached[1]) if cached[1] is not None else None
+        bundle = self._session.exec(select(Bundle).order_by(Bundle.created_at.desc()).limit(1)).first()
+        if scope is not None:
+            with _count_cache_lock:
+                _bundle_info_cache[scope] = (now, bundle.model_dump() if bundle is not None else None)
+        return bundle
+
+    def close(self) -> None:
+        """
+        Close connections and clean up resources.
+        """
+        self._session.close()
@@ -0,0 +1,14 @@
+"""
+orjson encoding for the JSON columns, passed to create_engine in place of the stdlib json module.
+"""
+
+import orjson
+
+
+def dumps(value) -> str:
+    """Encode a JSON column value. Non-string keys become strings, as with json.dumps."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Keyword arguments for create_engine; every dialect's JSON type reads these
+JSON_ENGINE_ARGS = {"json_serializer": dumps, "json_deserializer": orjson.loads}
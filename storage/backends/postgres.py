@@ -2,16 +2,68 @@
 PostgreSQL implementation of the storage interface.
 """
 
-import json
+import csv
+import io
+import logging
+import os
 from typing import Optional, Sequence
-from sqlalchemy import func
+from sqlalchemy import String, any_, bindparam, func, lambda_stmt, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import load_only
 from sqlmodel import Session, select
-from storage.interfaces import StorageInterface
+from storage.backends.bundle_reader import parse_batches_in_background
+from storage.backends.common import (
+    BULK_BATCH_SIZE,
+    ENTITY_DEFAULTS,
+    RELATIONSHIP_DEFAULTS,
+    RELATIONSHIP_KEY,
+    REBUILD_INDEXES_MIN_BYTES,
+    SessionStorage,
+    clear_read_caches,
+    normalize_entity,
+    normalize_relationship,
+    relationship_count_statement,
+)
+from storage.backends.json_columns import dumps as dump_json
 from storage.models import Bundle, Entity, Relationship
 from query.bundle import BundleManifestV1
 
+logger = logging.getLogger(__name__)
 
-class PostgresStorage(StorageInterface):
+# Rows fetched per round trip when streaming a query without a limit
+STREAM_BATCH_SIZE = 500
+
+# Temporary tables that bundle rows are copied into before being moved into place
+ENTITY_STAGING_TABLE = "_stage_entity"
+RELATIONSHIP_STAGING_TABLE = "_stage_relationship"
+
+# DBAPI drivers whose COPY FROM STDIN _copy_rows knows how to use
+COPY_DRIVERS = frozenset({"psycopg2", "psycopg"})
+
+# Unfiltered counts of tables at least this large use the planner's row estimate instead of COUNT(*)
+APPROXIMATE_COUNT_MIN_ROWS = 100_000
+
+
+def _entity_row(data: dict) -> list:
+    """Turn a parsed bundle entity into its COPY column values, in ENTITY_DEFAULTS order."""
+    data = normalize_entity(data)
+    return [data.get(column, default) for column, default in ENTITY_DEFAULTS.items()]
+
+
+def _relationship_row(data: dict) -> list:
+    """Turn a parsed bundle relationship into its COPY column values, in RELATIONSHIP_DEFAULTS order."""
+    data = normalize_relationship(data)
+    return [data.get(column, default) for column, default in RELATIONSHIP_DEFAULTS.items()]
+
+
+def _like_prefix(prefix: str) -> str:
+    """Return a LIKE pattern matching strings that start with prefix, taken literally."""
+    # Backslash is PostgreSQL's default LIKE escape character
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class PostgresStorage(SessionStorage):
     """
     PostgreSQL implementation of the storage interface.
     """
@@ -25,92 +77,119 @@ class PostgresStorage(StorageInterface):
         This is an idempotent operation. If the bundle is already loaded, it will do nothing.
         """
         if self.is_bundle_loaded(bundle_manifest.bundle_id):
-            print(f"Bundle {bundle_manifest.bundle_id} already loaded. Skipping.")
+            logger.info("Bundle %s already loaded. Skipping.", bundle_manifest.bundle_id)
             return
 
-        print(f"Loading bundle {bundle_manifest.bundle_id} from {bundle_path}")
+        logger.info("Loading bundle %s from %s", bundle_manifest.bundle_id, bundle_path)
 
-        # Load entities
+        # Stream rows into staging tables with COPY, then move them into place with one statement each.
+        # A worker thread parses the next batches while the current one is being written.
         entities_file = f"{bundle_path}/{bundle_manifest.entities.path}"
-        with open(entities_file, "r") as f:
-            for line in f:
-                entity_data = json.loads(line)
-                # Flatten metadata into top-level fields if present
-                entity_data = self._normalize_entity(entity_data)
-                entity = Entity(**entity_data)
-                self._session.merge(entity)
+        self._create_staging_table(ENTITY_STAGING_TABLE, Entity.__tablename__, ENTITY_DEFAULTS)
+        # Flatten metadata into top-level fields if present
+        for batch in parse_batches_in_background(entities_file, _entity_row, BULK_BATCH_SIZE):
+            self._copy_rows(ENTITY_STAGING_TABLE, ENTITY_DEFAULTS, batch)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Staged %d entities", len(batch))
+        dropped = self._drop_secondary_indexes(Entity.__table__) if os.path.getsize(entities_file) >= REBUILD_INDEXES_MIN_BYTES else []
+        self._upsert_staged_entities()
+        self._recreate_indexes(dropped)
 
         # Load relationships
         relationships_file = f"{bundle_path}/{bundle_manifest.relationships.path}"
-        with open(relationships_file, "r") as f:
-            for line in f:
-                relationship_data = json.loads(line)
-                # Map source_entity_id/target_entity_id to subject_id/object_id
-                relationship_data = self._normalize_relationship(relationship_data)
-                relationship = Relationship(**relationship_data)
-                self._session.merge(relationship)
+        self._create_staging_table(RELATIONSHIP_STAGING_TABLE, Relationship.__tablename__, RELATIONSHIP_DEFAULTS)
+        # Map source_entity_id/target_entity_id to subject_id/object_id
+        for batch in parse_batches_in_background(relationships_file, _relationship_row, BULK_BATCH_SIZE):
+            self._copy_rows(RELATIONSHIP_STAGING_TABLE, RELATIONSHIP_DEFAULTS, batch)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Staged %d relationships", len(batch))
+        dropped = self._drop_secondary_indexes(Relationship.__table__) if os.path.getsize(relationships_file) >= REBUILD_INDEXES_MIN_BYTES else []
+        self._insert_staged_relationships()
+        self._recreate_indexes(dropped)
 
         self.record_bundle(bundle_manifest)
         self._session.commit()
+        clear_read_caches()
 
-    def _normalize_entity(self, data: dict) -> dict:
-        """Normalize entity data, flattening metadata fields."""
-        result = dict(data)
-        # If metadata contains fields that should be top-level, extract them
-        if "metadata" in result and isinstance(result["metadata"], dict):
-            meta = result.pop("metadata")
-            for key in ["status", "usage_count", "source", "created_at"]:
-                if key in meta and key not in result:
-                    result[key] = meta[key]
-            # Store remaining metadata in properties
-            if meta:
-                result.setdefault("properties", {}).update(meta)
-        return result
-
-    def _normalize_relationship(self, data: dict) -> dict:
-        """Normalize relationship data, mapping field names."""
-        result = dict(data)
-        # Map source_entity_id -> subject_id
-        if "source_entity_id" in result and "subject_id" not in result:
-            result["subject_id"] = result.pop("source_entity_id")
-        # Map target_entity_id -> object_id
-        if "target_entity_id" in result and "object_id" not in result:
-            result["object_id"] = result.pop("target_entity_id")
-        # Handle metadata -> properties
-        if "metadata" in result and isinstance(result["metadata"], dict):
-            meta = result.pop("metadata")
-            if "source_documents" in meta and "source_documents" not in result:
-                result["source_documents"] = meta.pop("source_documents", [])
-            result.setdefault("properties", {}).update(meta)
-        # Remove fields not in the model
-        result.pop("relationship_id", None)
-        result.pop("evidence_document_id", None)
-        return result
-
-    def is_bundle_loaded(self, bundle_id: str) -> bool:
-        """
-        Check if a bundle with the given ID is already loaded.
-        """
-        bundle = self._session.get(Bundle, bundle_id)
-        return bundle is not None
-
-    def record_bundle(self, bundle_manifest: BundleManifestV1) -> None:
-        """
-        Record that a bundle has been loaded.
-        """
-        bundle = Bundle(
-            bundle_id=bundle_manifest.bundle_id,
-            domain=bundle_manifest.domain,
-            created_at=bundle_manifest.created_at,
-            bundle_version=bundle_manifest.get_version_str(),
+    def _create_staging_table(self, staging_table: str, table: str, columns) -> None:
+        """
+        Create an empty temporary table with the given columns of table, plus a _seq
+        column numbering rows in load order. It is dropped when the transaction commits.
+        """
+        self._session.exec(text(f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA"))
+        self._session.exec(text(f"ALTER TABLE {staging_table} ADD COLUMN _seq bigserial"))
+
+    def _copy_rows(self, staging_table: str, columns, rows: list[list]) -> None:
+        """Write rows to a staging table with COPY FROM STDIN, sending JSON values as text."""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        # Quote every non-NULL value so that empty strings and NULLs stay distinct
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+        for row in rows:
+            writer.writerow([dump_json(value) if isinstance(value, (dict, list)) else value for value in row])
+        buffer.seek(0)
+        copy_sql = f"COPY {staging_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        # The raw DBAPI connection of the session's transaction, so the COPY joins it.
+        # psycopg2 and psycopg 3 each have their own COPY API (see COPY_DRIVERS).
+        with self._session.connection().connection.cursor() as cursor:
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def _upsert_staged_entities(self) -> None:
+        """Move staged entities into the entity table, replacing any existing entity with the same ID."""
+        columns = ", ".join(ENTITY_DEFAULTS)
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in ENTITY_DEFAULTS if column != "entity_id")
+        # Later rows win, as with merge(), and one statement must not update a row twice
+        self._session.exec(
+            text(
+                f"INSERT INTO {Entity.__tablename__} ({columns}) "
+                f"SELECT DISTINCT ON (entity_id) {columns} FROM {ENTITY_STAGING_TABLE} ORDER BY entity_id, _seq DESC "
+                f"ON CONFLICT (entity_id) DO UPDATE SET {updates}"
+            )
         )
-        self._session.add(bundle)
 
-    def get_entity(self, entity_id: str) -> Optional[Entity]:
+    def _insert_staged_relationships(self) -> None:
+        """
+        Move staged relationships into the relationship table, updating any existing
+        relationship with the same triple. New relationships get a new ID.
+        """
+        columns = ", ".join(RELATIONSHIP_DEFAULTS)
+        key = ", ".join(RELATIONSHIP_KEY)
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in RELATIONSHIP_DEFAULTS if column not in RELATIONSHIP_KEY)
+        # As with entities, the last row for a triple wins
+        self._session.exec(
+            text(
+                f"INSERT INTO {Relationship.__tablename__} ({columns}) "
+                f"SELECT {columns} FROM "
+                f"(SELECT DISTINCT ON ({key}) {columns} FROM {RELATIONSHIP_STAGING_TABLE} ORDER BY {key}, _seq DESC) AS staged "
+                f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+            )
+        )
+
+    def truncate_all(self) -> None:
+        """
+        Remove all entities, relationships and bundle records in one transaction.
+        """
+        # TRUNCATE skips the per-row work of DELETE and clears all three tables in one statement
+        tables = ", ".join(model.__tablename__ for model in (Relationship, Entity, Bundle))
+        self._session.exec(text(f"TRUNCATE TABLE {tables}"))
+        self._session.commit()
+        clear_read_caches()
+
+    def get_entities_by_ids(self, ids: Sequence[str]) -> dict[str, Entity]:
         """
-        Get an entity by its ID.
+        Get the entities with the given IDs in one query, keyed by entity ID.
+        IDs with no matching entity are left out.
         """
-        return self._session.get(Entity, entity_id)
+        if not ids:
+            return {}
+        # One array parameter (= ANY($1)) keeps the SQL text and plan the same for any number of IDs
+        statement = select(Entity).where(Entity.entity_id == any_(bindparam("ids", list(ids), type_=ARRAY(String))))
+        return {entity.entity_id: entity for entity in self._session.exec(statement)}
 
     def get_entities(
         self,
@@ -119,36 +198,56 @@ class PostgresStorage(StorageInterface):
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
+        after: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
     ) -> Sequence[Entity]:
         """
-        List entities with optional filtering.
+        List entities with optional filtering, ordered by entity_id.
+        If after is given, only entities whose ID sorts after it are returned (keyset pagination).
+        If columns is given, only those columns are read; any other is loaded on first access.
         """
-        statement = select(Entity)
+        # Lambda statements are built and compiled once per combination of filters;
+        # later calls only bind the new values
+        statement = lambda_stmt(lambda: select(Entity))
         if entity_type:
-            statement = statement.where(Entity.entity_type == entity_type)
+            statement += lambda s: s.where(Entity.entity_type == entity_type)
         if name:
-            statement = statement.where(Entity.name == name)
+            statement += lambda s: s.where(Entity.name == name)
         if name_contains:
-            statement = statement.where(Entity.name.ilike(f"%{name_contains}%"))
+            pattern = f"%{name_contains}%"
+            statement += lambda s: s.where(Entity.name.ilike(pattern))
+        if name_startswith:
+            prefix = _like_prefix(name_startswith)
+            statement += lambda s: s.where(Entity.name.like(prefix))
         if source:
-            statement = statement.where(Entity.source == source)
+            statement += lambda s: s.where(Entity.source == source)
         if status:
-            statement = statement.where(Entity.status == status)
-        statement = statement.limit(limit).offset(offset)
-        return self._session.exec(statement).all()
+            statement += lambda s: s.where(Entity.status == status)
+        if after:
+            # Seek past the previous page on the primary key instead of scanning OFFSET rows
+            statement += lambda s: s.where(Entity.entity_id > after)
+        if columns:
+            # The columns are part of the statement's shape, so they go into its cache key
+            attributes = tuple(getattr(Entity, column) for column in columns)
+            statement = statement.add_criteria(lambda s: s.options(load_only(*attributes)), track_on=[attributes])
+        statement += lambda s: s.order_by(Entity.entity_id).limit(limit).offset(offset)
+        return self._session.exec(statement).scalars().all()
 
     def count_entities(
         self,
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
     ) -> int:
         """
         Count entities matching filter criteria.
+        Without filters, a large table's count is the planner's estimate rather than exact.
         """
         statement = select(func.count(Entity.entity_id))  # pylint: disable=not-callable
         if entity_type:
@@ -157,35 +256,26 @@ class PostgresStorage(StorageInterface):
             statement = statement.where(Entity.name == name)
         if name_contains:
             statement = statement.where(Entity.name.ilike(f"%{name_contains}%"))
+        if name_startswith:
+            statement = statement.where(Entity.name.like(_like_prefix(name_startswith)))
         if source:
             statement = statement.where(Entity.source == source)
         if status:
             statement = statement.where(Entity.status == status)
-        return self._session.exec(statement).one()
+        if not any((entity_type, name, name_contains, name_startswith, source, status)):
+            estimate = self._estimated_count(Entity.__tablename__)
+            if estimate is not None:
+                return estimate
+        return self._cached_count((Entity.__tablename__, entity_type, name, name_contains, name_startswith, source, status), statement)
 
-    def find_relationships(
-        self,
-        subject_id: Optional[str] = None,
-        predicate: Optional[str] = None,
-        object_id: Optional[str] = None,
-        limit: Optional[int] = None,
-        offset: Optional[int] = None,
-    ) -> Sequence[Relationship]:
-        """
-        Find relationships matching criteria.
-        """
-        statement = select(Relationship)
-        if subject_id:
-            statement = statement.where(Relationship.subject_id == subject_id)
-        if predicate:
-            statement = statement.where(Relationship.predicate == predicate)
-        if object_id:
-            statement = statement.where(Relationship.object_id == object_id)
-        if limit:
-            statement = statement.limit(limit)
-        if offset:
-            statement = statement.offset(offset)
-        return self._session.exec(statement).all()
+    def _estimated_count(self, table_name: str) -> Optional[int]:
+        """
+        Return the planner's row estimate for a table if it is large enough to be worth
+        using instead of an exact count, else None. The estimate is updated by ANALYZE.
+        """
+        statement = text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table_name")
+        estimate = self._session.exec(statement.bindparams(table_name=table_name)).scalar_one_or_none()
+        return estimate if estimate is not None and estimate >= APPROXIMATE_COUNT_MIN_ROWS else None
 
     def count_relationships(
         self,
@@ -195,44 +285,23 @@ class PostgresStorage(StorageInterface):
     ) -> int:
         """
         Count relationships matching filter criteria.
+        Without filters, a large table's count is the planner's estimate rather than exact.
         """
-        statement = select(func.count(Relationship.id))  # pylint: disable=not-callable
-        if subject_id:
-            statement = statement.where(Relationship.subject_id == subject_id)
-        if predicate:
-            statement = statement.where(Relationship.predicate == predicate)
-        if object_id:
-            statement = statement.where(Relationship.object_id == object_id)
-        return self._session.exec(statement).one()
+        if not any((subject_id, predicate, object_id)):
+            estimate = self._estimated_count(Relationship.__tablename__)
+            if estimate is not None:
+                return estimate
+        statement = relationship_count_statement(subject_id, predicate, object_id)
+        return self._cached_count((Relationship.__tablename__, subject_id, predicate, object_id), statement)
 
-    def get_relationship(self, subject_id: str, predicate: str, object_id: str) -> Optional[Relationship]:
-        """
-        Get a relationship by its canonical triple (subject_id, predicate, object_id).
-        """
-        statement = select(Relationship).where(
-            Relationship.subject_id == subject_id,
-            Relationship.predicate == predicate,
-            Relationship.object_id == object_id,
-        )
-        return self._session.exec(statement).first()
-
-    def get_relationships(self, limit: int = 100, offset: int = 0) -> Sequence[Relationship]:
-        """
-        List all relationships.
-        """
-        statement = select(Relationship).limit(limit).offset(offset)
-        return self._session.exec(statement).all()
+    def _fetch_all(self, statement, params: dict, stream: bool = False) -> Sequence:
+        """Run a query and return all of its rows, through a server-side cursor if stream is set."""
+        if not stream:
+            return self._session.exec(statement, params=params).all()
+        # Read in chunks rather than buffering every raw row
+        execution_options = {"stream_results": True, "yield_per": STREAM_BATCH_SIZE}
+        return list(self._session.exec(statement, params=params, execution_options=execution_options))
 
-    def get_bundle_info(self):
-        """
-        Get bundle metadata (latest bundle).
-        Returns None if no bundle is loaded.
-        """
-        statement = select(Bundle).order_by(Bundle.created_at.desc()).limit(1)
-        return self._session.exec(statement).first()
-
-    def close(self) -> None:
-        """
-        Close connections and clean up resources.
-        """
-        self._session.close()
+    def _cache_scope(self) -> URL:
+        """The database URL, so storages on the same database share cached reads."""
+        return self._session.get_bind().url
@@ -2,22 +2,152 @@
 SQLite implementation of the storage interface.
 """
 
-import json
+import logging
+import os
+import re
+from functools import cache
 from typing import Optional, Sequence
-from sqlalchemy import func
-from sqlmodel import Session, SQLModel, create_engine, select
-from storage.interfaces import StorageInterface
+from sqlalchemy import Table, bindparam, column, event, func, lambda_stmt, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import load_only
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, delete, select
+from storage.backends.bundle_reader import parse_batches_in_background
+from storage.backends.common import (
+    BULK_BATCH_SIZE,
+    ENTITY_DEFAULTS,
+    RELATIONSHIP_DEFAULTS,
+    RELATIONSHIP_KEY,
+    REBUILD_INDEXES_MIN_BYTES,
+    SessionStorage,
+    clear_read_caches,
+    normalize_entity,
+    normalize_relationship,
+    relationship_count_statement,
+)
+from storage.backends.json_columns import JSON_ENGINE_ARGS
 from storage.models import Bundle, Entity, Relationship
+from storage.models.entity import ENTITY_NAME_FTS_KEY_TABLE, ENTITY_NAME_FTS_TABLE, create_entity_name_fts_triggers, drop_entity_name_fts_triggers
+from storage.models.stats import KG_STATS_TABLE, create_stats_triggers, drop_stats_triggers
 from query.bundle import BundleManifestV1
 
+logger = logging.getLogger(__name__)
 
-class SQLiteStorage(StorageInterface):
+# The FTS5 trigram index over entity names (see storage.models.entity)
+ENTITY_NAME_FTS = table(ENTITY_NAME_FTS_TABLE, column("rowid"), column("name"))
+ENTITY_NAME_FTS_KEY = table(ENTITY_NAME_FTS_KEY_TABLE, column("rowid"), column("entity_id"))
+
+# Trigger-maintained row counts (see storage.models.stats)
+KG_STATS = table(KG_STATS_TABLE, column("key"), column("value"))
+
+# Applied to every new connection. WAL lets readers run alongside a bundle load, and
+# synchronous=NORMAL is still crash-safe in WAL mode while skipping most fsyncs.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 268_435_456,
+    "cache_size": -131_072,  # in KiB, so 128 MiB
+}
+
+
+def _set_pragmas(dbapi_connection, _connection_record) -> None:
+    """Run SQLITE_PRAGMAS on a newly opened DB-API connection."""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def configure_engine(engine: Engine) -> None:
+    """Tune every connection that engine opens from now on with SQLITE_PRAGMAS."""
+    event.listen(engine, "connect", _set_pragmas)
+
+
+def _name_contains(pattern):
+    """
+    Return a condition matching entities whose name matches a LIKE pattern, given as a string
+    or bind parameter, ignoring ASCII case. It is answered from the entity name trigram index
+    rather than by scanning entity.
+    """
+    # LIKE on the FTS table uses the trigram index for substrings of three or more characters.
+    # The trigram tokenizer folds case, so this matches as ILIKE did.
+    matches = select(ENTITY_NAME_FTS.c.rowid).where(ENTITY_NAME_FTS.c.name.like(pattern))
+    return Entity.entity_id.in_(select(ENTITY_NAME_FTS_KEY.c.entity_id).where(ENTITY_NAME_FTS_KEY.c.rowid.in_(matches)))
+
+
+def _glob_prefix(prefix: str) -> str:
+    """
+    Return a GLOB pattern matching names that start with prefix, case-sensitively.
+    GLOB can use the index on entity.name for a fixed prefix, unlike the case-insensitive LIKE.
+    """
+    # Bracket GLOB's wildcards so they match themselves
+    return re.sub(r"([*?\[])", r"[\1]", prefix) + "*"
+
+
+# Filters of get_entities, in the order their conditions are added
+ENTITY_FILTERS = ("entity_type", "name", "name_contains", "name_startswith", "source", "status", "after")
+
+
+@cache
+def _entity_statement(filters: tuple[str, ...], columns: tuple[str, ...] = ()):
+    """
+    Build the get_entities query for one combination of ENTITY_FILTERS, with every value as
+    a named bind parameter, reading only the given columns if any. Each variant is built
+    once and reused, so SQLAlchemy never rebuilds the statement or recompiles it.
+    name_contains is bound as a LIKE pattern and name_startswith as a GLOB pattern.
+    """
+    statement = select(Entity)
+    if columns:
+        statement = statement.options(load_only(*(getattr(Entity, column) for column in columns)))
+    for name in ("entity_type", "name", "source", "status"):
+        if name in filters:
+            statement = statement.where(getattr(Entity, name) == bindparam(name))
+    if "name_contains" in filters:
+        statement = statement.where(_name_contains(bindparam("name_contains")))
+    if "name_startswith" in filters:
+        statement = statement.where(Entity.name.op("GLOB")(bindparam("name_startswith")))
+    if "after" in filters:
+        # Seek past the previous page on the primary key instead of scanning OFFSET rows
+        statement = statement.where(Entity.entity_id > bindparam("after"))
+    return statement.order_by(Entity.entity_id).limit(bindparam("limit")).offset(bindparam("offset"))
+
+
+def _entity_row(data: dict) -> dict:
+    """Turn a parsed bundle entity into insert parameters for every entity column."""
+    data = normalize_entity(data)
+    return {column: data.get(column, default) for column, default in ENTITY_DEFAULTS.items()}
+
+
+def _relationship_row(data: dict) -> dict:
+    """Turn a parsed bundle relationship into insert parameters for every relationship column but id."""
+    data = normalize_relationship(data)
+    return {column: data.get(column, default) for column, default in RELATIONSHIP_DEFAULTS.items()}
+
+
+class SQLiteStorage(SessionStorage):
     """
     SQLite implementation of the storage interface.
     """
 
-    def __init__(self, db_path: str):
-        self.engine = create_engine(f"sqlite:///{db_path}")
+    def __init__(self, db_path: Optional[str] = None, session: Optional[Session] = None):
+        """
+        Open the database at db_path, or use an existing session
+        whose engine already has the tables created.
+        """
+        if session is not None:
+            self.engine = session.get_bind()
+            self._session = session
+            return
+        if db_path is None:
+            raise ValueError("Either db_path or session is required.")
+        engine_args = {}
+        if db_path == ":memory:":
+            # Callers may use the storage from worker threads, which must all see one database
+            engine_args = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        self.engine = create_engine(f"sqlite:///{db_path}", **JSON_ENGINE_ARGS, **engine_args)
+        configure_engine(self.engine)
         SQLModel.metadata.create_all(self.engine)
         self._session = Session(self.engine)
 
@@ -27,84 +157,118 @@ class SQLiteStorage(StorageInterface):
         This is an idempotent operation. If the bundle is already loaded, it will do nothing.
         """
         if self.is_bundle_loaded(bundle_manifest.bundle_id):
-            print(f"Bundle {bundle_manifest.bundle_id} already loaded. Skipping.")
+            logger.info("Bundle %s already loaded. Skipping.", bundle_manifest.bundle_id)
             return
 
-        print(f"Loading bundle {bundle_manifest.bundle_id} from {bundle_path}")
+        logger.info("Loading bundle %s from %s", bundle_manifest.bundle_id, bundle_path)
+        self._begin_immediate()
 
-        # Load entities
+        # Load entities, writing them in batches rather than merging one ORM object at a time.
+        # A worker thread parses the next batches while the current one is being written.
+        # A large file is loaded with the indexes and triggers that track each row switched off,
+        # and what they maintain is rebuilt in one pass at the end.
         entities_file = f"{bundle_path}/{bundle_manifest.entities.path}"
-        with open(entities_file, "r") as f:
-            for line in f:
-                entity_data = json.loads(line)
-                entity_data = self._normalize_entity(entity_data)
-                entity = Entity(**entity_data)
-                self._session.merge(entity)
+        bulk = os.path.getsize(entities_file) >= REBUILD_INDEXES_MIN_BYTES
+        dropped = self._drop_secondary_indexes(Entity.__table__) if bulk else []
+        if bulk:
+            self._drop_row_triggers(Entity.__table__)
+        for batch in parse_batches_in_background(entities_file, _entity_row, BULK_BATCH_SIZE):
+            self._upsert_entities(batch)
+        self._recreate_indexes(dropped)
+        if bulk:
+            self._recreate_row_triggers(Entity.__table__)
 
         # Load relationships
         relationships_file = f"{bundle_path}/{bundle_manifest.relationships.path}"
-        with open(relationships_file, "r") as f:
-            for line in f:
-                relationship_data = json.loads(line)
-                relationship_data = self._normalize_relationship(relationship_data)
-                relationship = Relationship(**relationship_data)
-                self._session.merge(relationship)
+        bulk = os.path.getsize(relationships_file) >= REBUILD_INDEXES_MIN_BYTES
+        dropped = self._drop_secondary_indexes(Relationship.__table__) if bulk else []
+        if bulk:
+            self._drop_row_triggers(Relationship.__table__)
+        for batch in parse_batches_in_background(relationships_file, _relationship_row, BULK_BATCH_SIZE):
+            self._insert_relationships(batch)
+        self._recreate_indexes(dropped)
+        if bulk:
+            self._recreate_row_triggers(Relationship.__table__)
 
         self.record_bundle(bundle_manifest)
         self._session.commit()
+        clear_read_caches()
+
+    def _begin_immediate(self) -> None:
+        """
+        Take the write lock now, unless the session is already writing. sqlite3 would otherwise
+        begin a deferred transaction at the first INSERT, which can fail with SQLITE_BUSY partway
+        through if another connection writes first, and would leave the index DDL outside it.
+        """
+        connection = self._session.connection()
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _drop_row_triggers(self, table: Table) -> None:
+        """
+        Drop the triggers that update the stats table, and for entity the name index, on every
+        row written to table, so a bulk load doesn't run them row by row. The load's transaction
+        holds the write lock, so no other writer can change the table while they are gone.
+        """
+        connection = self._session.connection()
+        drop_stats_triggers(connection, table.name)
+        if table is Entity.__table__:
+            drop_entity_name_fts_triggers(connection)
+
+    def _recreate_row_triggers(self, table: Table) -> None:
+        """Create the triggers dropped by _drop_row_triggers again, rebuilding what they maintain in one pass."""
+        connection = self._session.connection()
+        create_stats_triggers(connection, table.name)
+        if table is Entity.__table__:
+            create_entity_name_fts_triggers(connection)
 
-    def _normalize_entity(self, data: dict) -> dict:
-        """Normalize entity data, flattening metadata fields."""
-        result = dict(data)
-        if "metadata" in result and isinstance(result["metadata"], dict):
-            meta = result.pop("metadata")
-            for key in ["status", "usage_count", "source", "created_at"]:
-                if key in meta and key not in result:
-                    result[key] = meta[key]
-            if meta:
-                result.setdefault("properties", {}).update(meta)
-        return result
-
-    def _normalize_relationship(self, data: dict) -> dict:
-        """Normalize relationship data, mapping field names."""
-        result = dict(data)
-        if "source_entity_id" in result and "subject_id" not in result:
-            result["subject_id"] = result.pop("source_entity_id")
-        if "target_entity_id" in result and "object_id" not in result:
-            result["object_id"] = result.pop("target_entity_id")
-        if "metadata" in result and isinstance(result["metadata"], dict):
-            meta = result.pop("metadata")
-            if "source_documents" in meta and "source_documents" not in result:
-                result["source_documents"] = meta.pop("source_documents", [])
-            result.setdefault("properties", {}).update(meta)
-        result.pop("relationship_id", None)
-        result.pop("evidence_document_id", None)
-        return result
-
-    def is_bundle_loaded(self, bundle_id: str) -> bool:
-        """
-        Check if a bundle with the given ID is already loaded.
-        """
-        bundle = self._session.get(Bundle, bundle_id)
-        return bundle is not None
-
-    def record_bundle(self, bundle_manifest: BundleManifestV1) -> None:
-        """
-        Record that a bundle has been loaded.
-        """
-        bundle = Bundle(
-            bundle_id=bundle_manifest.bundle_id,
-            domain=bundle_manifest.domain,
-            created_at=bundle_manifest.created_at,
-            bundle_version=bundle_manifest.get_version_str(),
+    def _upsert_entities(self, rows: list[dict]) -> None:
+        """Insert entity rows, replacing any existing entity with the same ID."""
+        if not rows:
+            return
+        # Later rows win, as with merge(), and one statement must not update a row twice
+        rows = list({row["entity_id"]: row for row in rows}.values())
+        statement = insert(Entity)
+        statement = statement.on_conflict_do_update(
+            index_elements=["entity_id"],
+            set_={column: statement.excluded[column] for column in ENTITY_DEFAULTS if column != "entity_id"},
         )
-        self._session.add(bundle)
+        self._session.exec(statement, params=rows)
+
+    def _insert_relationships(self, rows: list[dict]) -> None:
+        """
+        Insert relationship rows, updating any existing relationship with the same triple.
+        New relationships get an ID from the column default.
+        """
+        if not rows:
+            return
+        statement = insert(Relationship)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(RELATIONSHIP_KEY),
+            set_={column: statement.excluded[column] for column in RELATIONSHIP_DEFAULTS if column not in RELATIONSHIP_KEY},
+        )
+        self._session.exec(statement, params=rows)
+
+    def truncate_all(self) -> None:
+        """
+        Remove all entities, relationships and bundle records in one transaction.
+        """
+        # Commit the DELETEs together; the stats and FTS triggers keep them from being plain truncates
+        self._session.exec(delete(Relationship))
+        self._session.exec(delete(Entity))
+        self._session.exec(delete(Bundle))
+        self._session.commit()
+        clear_read_caches()
 
-    def get_entity(self, entity_id: str) -> Optional[Entity]:
+    def get_entities_by_ids(self, ids: Sequence[str]) -> dict[str, Entity]:
         """
-        Get an entity by its ID.
+        Get the entities with the given IDs in one query, keyed by entity ID.
+        IDs with no matching entity are left out.
         """
-        return self._session.get(Entity, entity_id)
+        if not ids:
+            return {}
+        statement = select(Entity).where(Entity.entity_id.in_(ids))
+        return {entity.entity_id: entity for entity in self._session.exec(statement)}
 
     def get_entities(
         self,
@@ -113,75 +277,63 @@ class SQLiteStorage(StorageInterface):
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
+        after: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
     ) -> Sequence[Entity]:
         """
-        List entities with optional filtering.
+        List entities with optional filtering, ordered by entity_id.
+        If after is given, only entities whose ID sorts after it are returned (keyset pagination).
+        If columns is given, only those columns are read; any other is loaded on first access.
         """
-        statement = select(Entity)
-        if entity_type:
-            statement = statement.where(Entity.entity_type == entity_type)
-        if name:
-            statement = statement.where(Entity.name == name)
-        if name_contains:
-            # SQLite doesn't have ILIKE, but LIKE is case-insensitive for ASCII
-            # Use ilike() which SQLAlchemy will translate appropriately
-            statement = statement.where(Entity.name.ilike(f"%{name_contains}%"))
-        if source:
-            statement = statement.where(Entity.source == source)
-        if status:
-            statement = statement.where(Entity.status == status)
-        statement = statement.limit(limit).offset(offset)
-        return self._session.exec(statement).all()
+        values = {
+            "entity_type": entity_type,
+            "name": name,
+            "name_contains": f"%{name_contains}%" if name_contains else None,
+            "name_startswith": _glob_prefix(name_startswith) if name_startswith else None,
+            "source": source,
+            "status": status,
+            "after": after,
+        }
+        params = {key: value for key, value in values.items() if value} | {"limit": limit, "offset": offset}
+        statement = _entity_statement(tuple(key for key in ENTITY_FILTERS if key in params), tuple(columns or ()))
+        return self._session.exec(statement, params=params).all()
 
     def count_entities(
         self,
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
     ) -> int:
         """
         Count entities matching filter criteria.
         """
+        if not any((name, name_contains, name_startswith, source, status)):
+            return self._stat_count(f"entity:type:{entity_type}" if entity_type else "entity")
         statement = select(func.count(Entity.entity_id))  # pylint: disable=not-callable
         if entity_type:
             statement = statement.where(Entity.entity_type == entity_type)
         if name:
             statement = statement.where(Entity.name == name)
         if name_contains:
-            statement = statement.where(Entity.name.ilike(f"%{name_contains}%"))
+            statement = statement.where(_name_contains(f"%{name_contains}%"))
+        if name_startswith:
+            statement = statement.where(Entity.name.op("GLOB")(_glob_prefix(name_startswith)))
         if source:
             statement = statement.where(Entity.source == source)
         if status:
             statement = statement.where(Entity.status == status)
-        return self._session.exec(statement).one()
+        return self._cached_count((Entity.__tablename__, entity_type, name, name_contains, name_startswith, source, status), statement)
 
-    def find_relationships(
-        self,
-        subject_id: Optional[str] = None,
-        predicate: Optional[str] = None,
-        object_id: Optional[str] = None,
-        limit: Optional[int] = None,
-        offset: Optional[int] = None,
-    ) -> Sequence[Relationship]:
-        """
-        Find relationships matching criteria.
-        """
-        statement = select(Relationship)
-        if subject_id:
-            statement = statement.where(Relationship.subject_id == subject_id)
-        if predicate:
-            statement = statement.where(Relationship.predicate == predicate)
-        if object_id:
-            statement = statement.where(Relationship.object_id == object_id)
-        if limit:
-            statement = statement.limit(limit)
-        if offset:
-            statement = statement.offset(offset)
-        return self._session.exec(statement).all()
+    def _stat_count(self, key: str) -> int:
+        """Read a row count from the stats table; a key with no row counts nothing."""
+        statement = lambda_stmt(lambda: select(KG_STATS.c.value).where(KG_STATS.c.key == key))
+        return self._session.exec(statement).scalars().first() or 0
 
     def count_relationships(
         self,
@@ -192,43 +344,12 @@ class SQLiteStorage(StorageInterface):
         """
         Count relationships matching filter criteria.
         """
-        statement = select(func.count(Relationship.id))  # pylint: disable=not-callable
-        if subject_id:
-            statement = statement.where(Relationship.subject_id == subject_id)
-        if predicate:
-            statement = statement.where(Relationship.predicate == predicate)
-        if object_id:
-            statement = statement.where(Relationship.object_id == object_id)
-        return self._session.exec(statement).one()
-
-    def get_relationship(self, subject_id: str, predicate: str, object_id: str) -> Optional[Relationship]:
-        """
-        Get a relationship by its canonical triple (subject_id, predicate, object_id).
-        """
-        statement = select(Relationship).where(
-            Relationship.subject_id == subject_id,
-            Relationship.predicate == predicate,
-            Relationship.object_id == object_id,
-        )
-        return self._session.exec(statement).first()
+        if not subject_id and not object_id:
+            return self._stat_count(f"relationship:predicate:{predicate}" if predicate else "relationship")
+        statement = relationship_count_statement(subject_id, predicate, object_id)
+        return self._cached_count((Relationship.__tablename__, subject_id, predicate, object_id), statement)
 
-    def get_relationships(self, limit: int = 100, offset: int = 0) -> Sequence[Relationship]:
-        """
-        List all relationships.
-        """
-        statement = select(Relationship).limit(limit).offset(offset)
-        return self._session.exec(statement).all()
-
-    def get_bundle_info(self):
-        """
-        Get bundle metadata (latest bundle).
-        Returns None if no bundle is loaded.
-        """
-        statement = select(Bundle).order_by(Bundle.created_at.desc()).limit(1)
-        return self._session.exec(statement).first()
-
-    def close(self) -> None:
-        """
-        Close connections and clean up resources.
-        """
-        self._session.close()
+    def _cache_scope(self) -> Optional[str]:
+        """The database file; every in-memory engine is a separate database, so those are not cached."""
+        database = self.engine.url.database
+        return None if not database or database == ":memory:" else database
@@ -32,6 +32,22 @@ class StorageInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def prepare_reload(self, bundle_id: str, force: bool = False) -> bool:
+        """
+        Get ready to load the bundle with the given ID.
+        If force is set, all loaded data is cleared first.
+        Returns True if the bundle should be loaded.
+        """
+        pass
+
+    @abstractmethod
+    def truncate_all(self) -> None:
+        """
+        Remove all entities, relationships and bundle records in one transaction.
+        """
+        pass
+
     @abstractmethod
     def record_bundle(self, bundle_manifest: BundleManifestV1) -> None:
         """
@@ -40,9 +56,18 @@ class StorageInterface(ABC):
         pass
 
     @abstractmethod
-    def get_entity(self, entity_id: str) -> Optional[Entity]:
+    def get_entity(self, entity_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Entity]:
         """
         Get an entity by its ID.
+        If columns is given, only those columns are read; any other is loaded on first access.
+        """
+        pass
+
+    @abstractmethod
+    def get_entities_by_ids(self, ids: Sequence[str]) -> dict[str, Entity]:
+        """
+        Get the entities with the given IDs in one query, keyed by entity ID.
+        IDs with no matching entity are left out.
         """
         pass
 
@@ -54,11 +79,17 @@ class StorageInterface(ABC):
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
+        after: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
     ) -> Sequence[Entity]:
         """
-        List entities with optional filtering.
+        List entities with optional filtering, ordered by entity_id.
+        name_contains matches ignoring case; name_startswith is a case-sensitive prefix match.
+        If after is given, only entities whose ID sorts after it are returned (keyset pagination).
+        If columns is given, only those columns are read; any other is loaded on first access.
         """
         pass
 
@@ -68,6 +99,7 @@ class StorageInterface(ABC):
         entity_type: Optional[str] = None,
         name: Optional[str] = None,
         name_contains: Optional[str] = None,
+        name_startswith: Optional[str] = None,
         source: Optional[str] = None,
         status: Optional[str] = None,
     ) -> int:
@@ -84,9 +116,14 @@ class StorageInterface(ABC):
         object_id: Optional[str] = None,
         limit: Optional[int] = None,
         offset: Optional[int] = None,
+        after: Optional[tuple[str, str, str]] = None,
+        columns: Optional[Sequence[str]] = None,
     ) -> Sequence[Relationship]:
         """
-        Find relationships matching criteria.
+        Find relationships matching criteria, in a stable order.
+        If after is the (subject_id, predicate, object_id) triple of a relationship,
+        only relationships that sort after it are returned (keyset pagination).
+        If columns is given, only those columns are read; any other is loaded on first access.
         """
         pass
 
@@ -5,3 +5,6 @@ SQLModel schemas for database persistence.
 from .bundle import Bundle as Bundle
 from .entity import Entity as Entity
 from .relationship import Relationship as Relationship
+
+# Registers the SQLite stats table and triggers with the metadata
+from . import stats as stats
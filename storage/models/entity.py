@@ -3,6 +3,7 @@ Generic Entity model for the Knowledge Graph Server.
 """
 
 from typing import Optional, List, Any
+from sqlalchemy import DDL, Index, event
 from sqlmodel import Field, SQLModel, JSON, Column
 
 
@@ -11,8 +12,17 @@ class Entity(SQLModel, table=True):
     A generic entity in the knowledge graph.
     """
 
+    __table_args__ = (
+        # Covers the entity_type filter alone as well as entity_type + status
+        Index("entity_type_status_idx", "entity_type", "status"),
+        # Covers entity_type + source, e.g. one type of entity from one bundle source
+        Index("entity_type_source_idx", "entity_type", "source"),
+        # Trigram index so name ILIKE '%...%' (name_contains) doesn't scan the whole table
+        Index("entity_name_trgm_idx", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
     entity_id: str = Field(primary_key=True)
-    entity_type: str = Field(index=True)
+    entity_type: str
     name: Optional[str] = Field(default=None, index=True)
     status: Optional[str] = Field(default=None)
     confidence: Optional[float] = Field(default=None)
@@ -20,3 +30,74 @@ class Entity(SQLModel, table=True):
     source: Optional[str] = Field(default=None)
     synonyms: List[str] = Field(default=[], sa_column=Column(JSON))
     properties: dict[str, Any] = Field(default={}, sa_column=Column(JSON))
+
+
+# The trigram index needs the pg_trgm extension; metadata-level so it runs even when the table exists
+event.listen(SQLModel.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+# SQLite has no trigram index type. Instead an FTS5 table with the trigram tokenizer indexes
+# entity names, so name LIKE '%...%' can be answered from it rather than by scanning entities.
+ENTITY_NAME_FTS_TABLE = "entity_name_fts"
+# Maps the FTS table's rowids to entity IDs. entity has a TEXT primary key, so its own
+# rowids are not stable: VACUUM may renumber them, and an index keyed on them would drift.
+ENTITY_NAME_FTS_KEY_TABLE = "entity_name_fts_key"
+
+
+_ENTITY_NAME_FTS_TRIGGERS = ("insert", "delete", "update")
+
+
+def drop_entity_name_fts_triggers(connection) -> None:
+    """Drop the triggers that keep the entity name FTS table in step with entity."""
+    for trigger in _ENTITY_NAME_FTS_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {ENTITY_NAME_FTS_TABLE}_{trigger}")
+
+
+def create_entity_name_fts_triggers(connection) -> None:
+    """
+    Create the triggers that keep the entity name FTS table and its key table in step with
+    entity, and index the entities stored now in a single pass, replacing any earlier index.
+    """
+    fts, key = ENTITY_NAME_FTS_TABLE, ENTITY_NAME_FTS_KEY_TABLE
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON entity BEGIN "
+        f"INSERT INTO {key}(entity_id) VALUES (new.entity_id); "
+        f"INSERT INTO {fts}(rowid, name) VALUES (last_insert_rowid(), new.name); END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON entity BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = (SELECT rowid FROM {key} WHERE entity_id = old.entity_id); "
+        f"DELETE FROM {key} WHERE entity_id = old.entity_id; END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF entity_id, name ON entity BEGIN "
+        f"UPDATE {key} SET entity_id = new.entity_id WHERE entity_id = old.entity_id; "
+        f"UPDATE {fts} SET name = new.name WHERE rowid = (SELECT rowid FROM {key} WHERE entity_id = new.entity_id); END"
+    )
+    connection.exec_driver_sql(f"DELETE FROM {fts}")
+    connection.exec_driver_sql(f"DELETE FROM {key}")
+    connection.exec_driver_sql(f"INSERT INTO {key}(entity_id) SELECT entity_id FROM entity")
+    connection.exec_driver_sql(f"INSERT INTO {fts}(rowid, name) SELECT {key}.rowid, entity.name FROM {key} JOIN entity USING (entity_id)")
+
+
+def _create_entity_name_fts(_metadata, connection, **_kwargs) -> None:
+    """
+    On SQLite, create the entity name FTS5 table, its key table and the triggers that keep
+    them in step with the entity table, and index any entities that are already stored.
+    An FTS table from an older layout, keyed on entity rowids, is replaced, and so are
+    triggers missing because the entity table was dropped and created again.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    fts, key = ENTITY_NAME_FTS_TABLE, ENTITY_NAME_FTS_KEY_TABLE
+    if not connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = ?", (key,)).first():
+        drop_entity_name_fts_triggers(connection)
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {fts}")
+        # The key table's INTEGER PRIMARY KEY is its rowid, which VACUUM leaves alone
+        connection.exec_driver_sql(f"CREATE TABLE {key} (rowid INTEGER PRIMARY KEY, entity_id TEXT NOT NULL UNIQUE)")
+        # The FTS table keeps its own copy of the names, which LIKE on it reads to confirm matches
+        connection.exec_driver_sql(f"CREATE VIRTUAL TABLE {fts} USING fts5(name, tokenize='trigram')")
+    if not connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f"{fts}_insert",)).first():
+        create_entity_name_fts_triggers(connection)
+
+
+event.listen(SQLModel.metadata, "after_create", _create_entity_name_fts)
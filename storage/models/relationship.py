@@ -3,7 +3,7 @@ Generic Relationship model for the Knowledge Graph Server.
 """
 
 from typing import Optional, List, Any
-from uuid import UUID, uuid4
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, JSON, Column, UniqueConstraint
 
 
@@ -12,12 +12,19 @@ class Relationship(SQLModel, table=True):
     A generic relationship in the knowledge graph.
     """
 
-    __table_args__ = (UniqueConstraint("subject_id", "object_id", "predicate", name="uq_relationship"),)
+    __table_args__ = (
+        UniqueConstraint("subject_id", "object_id", "predicate", name="uq_relationship"),
+        # Cover find_relationships filtered by subject or object, alone or with the predicate.
+        # uq_relationship and these lead with subject_id and object_id, so those need no index of their own.
+        Index("rel_subject_predicate_idx", "subject_id", "predicate"),
+        Index("rel_object_predicate_idx", "object_id", "predicate"),
+    )
 
-    id: UUID = Field(default_factory=uuid4, primary_key=True)
-    subject_id: str = Field(index=True)
+    # A plain integer key, assigned by the database in insertion order; the triple is the real identity
+    id: Optional[int] = Field(default=None, primary_key=True)
+    subject_id: str
     predicate: str = Field(index=True)
-    object_id: str = Field(index=True)
+    object_id: str
     confidence: Optional[float] = Field(default=None)
     source_documents: List[str] = Field(default=[], sa_column=Column(JSON))
     properties: dict[str, Any] = Field(default={}, sa_column=Column(JSON))
@@ -0,0 +1,56 @@
+"""
+Row counts kept up to date by triggers, so SQLite can answer common counts without COUNT(*).
+"""
+
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+# Maps a key to a row count. Keys are "entity", "entity:type:<entity_type>",
+# "relationship" and "relationship:predicate:<predicate>".
+KG_STATS_TABLE = "kg_stats"
+
+# For each counted table, the column whose values get a count of their own and the key prefix for those counts
+COUNTED_TABLES = {"entity": ("entity_type", "entity:type:"), "relationship": ("predicate", "relationship:predicate:")}
+
+
+def _add(row: str, table: str, column: str, prefix: str, delta: str) -> str:
+    """Return trigger statements adding delta to the total of table and to the count of row's column value."""
+    return f"INSERT INTO {KG_STATS_TABLE} (key, value) VALUES ('{table}', {delta}), ('{prefix}' || {row}.{column}, {delta}) " f"ON CONFLICT (key) DO UPDATE SET value = value + excluded.value;"
+
+
+def drop_stats_triggers(connection, table: str) -> None:
+    """Drop the triggers that keep the counts of table up to date."""
+    for trigger in ("insert", "delete", "update"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_stats_{trigger}")
+
+
+def create_stats_triggers(connection, table: str) -> None:
+    """Create the triggers that keep the counts of table up to date, and recompute its counts in a single pass."""
+    column, prefix = COUNTED_TABLES[table]
+    trigger = f"{table}_stats"
+    connection.exec_driver_sql(f"CREATE TRIGGER {trigger}_insert AFTER INSERT ON {table} BEGIN {_add('new', table, column, prefix, '1')} END")
+    connection.exec_driver_sql(f"CREATE TRIGGER {trigger}_delete AFTER DELETE ON {table} BEGIN {_add('old', table, column, prefix, '-1')} END")
+    # The total is unchanged by an update, so the two additions to it cancel out
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER {trigger}_update AFTER UPDATE OF {column} ON {table} WHEN old.{column} IS NOT new.{column} "
+        f"BEGIN {_add('old', table, column, prefix, '-1')} {_add('new', table, column, prefix, '1')} END"
+    )
+    connection.exec_driver_sql(f"DELETE FROM {KG_STATS_TABLE} WHERE key = ? OR key LIKE ?", (table, f"{prefix}%"))
+    connection.exec_driver_sql(f"INSERT INTO {KG_STATS_TABLE} (key, value) SELECT ?, COUNT(*) FROM {table}", (table,))
+    connection.exec_driver_sql(f"INSERT INTO {KG_STATS_TABLE} (key, value) SELECT ? || {column}, COUNT(*) FROM {table} GROUP BY {column}", (prefix,))
+
+
+def _create_stats(_metadata, connection, **_kwargs) -> None:
+    """
+    On SQLite, create the stats table and the triggers that maintain it. A table whose triggers
+    are missing, because it is new or was dropped and created again, has its counts recomputed.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {KG_STATS_TABLE} (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    for table in COUNTED_TABLES:
+        if not connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f"{table}_stats_insert",)).first():
+            create_stats_triggers(connection, table)
+
+
+event.listen(SQLModel.metadata, "after_create", _create_stats)
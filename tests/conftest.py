@@ -9,6 +9,7 @@ from storage.backends.sqlite import SQLiteStorage
 from storage.models import Bundle, Entity, Relationship
 from query.graphql_schema import Query
 import strawberry
+from strawberry.extensions import ParserCache, ValidationCache
 
 
 @pytest.fixture
@@ -111,10 +112,13 @@ def graphql_context(populated_storage):
     return {"storage": populated_storage}
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def graphql_schema():
-    """Create GraphQL schema for testing."""
-    return strawberry.Schema(query=Query)
+    """
+    Create GraphQL schema for testing, caching parsed and validated queries like the server's.
+    The schema holds no data, so one instance serves the whole session.
+    """
+    return strawberry.Schema(query=Query, extensions=[ParserCache(maxsize=1024), ValidationCache(maxsize=1024)])
 
 
 @pytest.fixture
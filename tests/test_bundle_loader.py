@@ -10,22 +10,38 @@ Tests cover:
 
 import pytest
 import json
+import logging
+import os
 import zipfile
+import orjson
 from datetime import datetime
-from sqlalchemy import create_engine
-from sqlmodel import SQLModel
-
-from query.bundle_loader import _find_manifest, _load_from_directory, _load_from_zip
+from pathlib import PurePosixPath
+from sqlalchemy import create_engine, inspect
+from sqlmodel import Session, SQLModel
+
+from query.bundle import BundleManifestV1
+from query.bundle_loader import (
+    _copy_bundle_file,
+    _create_missing_indexes,
+    _drop_outdated_relationship_table,
+    _find_manifest,
+    _find_manifest_in_zip,
+    _iter_bundle_lines,
+    _load_document_assets,
+    _load_from_directory,
+    _load_from_zip,
+)
 from storage.backends.sqlite import SQLiteStorage
+from storage.models import Bundle, Relationship
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_manifest_data():
-    """Create sample manifest data."""
+    """Create sample manifest data. Shared by the module's tests, so copy it before changing it."""
     return {
         "bundle_id": "test-bundle-123",
         "domain": "test",
-        "created_at": datetime.now().isoformat(),
+        "created_at": datetime(2024, 1, 1).isoformat(),
         "bundle_version": "v1",
         "entities_file": "entities.jsonl",
         "relationships_file": "relationships.jsonl",
@@ -40,24 +56,15 @@ def bundle_directory(sample_manifest_data, tmp_path):
 
     # Create manifest.json
     manifest_path = bundle_dir / "manifest.json"
-    manifest_path.write_text(json.dumps(sample_manifest_data))
+    manifest_path.write_bytes(orjson.dumps(sample_manifest_data))
 
     # Create entities.jsonl
     entities_file = bundle_dir / "entities.jsonl"
-    entities_file.write_text(json.dumps({"entity_id": "test:1", "entity_type": "test", "name": "Test 1"}) + "\n")
+    entities_file.write_bytes(orjson.dumps({"entity_id": "test:1", "entity_type": "test", "name": "Test 1"}) + b"\n")
 
     # Create relationships.jsonl
     relationships_file = bundle_dir / "relationships.jsonl"
-    relationships_file.write_text(
-        json.dumps(
-            {
-                "subject_id": "test:1",
-                "predicate": "test",
-                "object_id": "test:2",
-            }
-        )
-        + "\n"
-    )
+    relationships_file.write_bytes(orjson.dumps({"subject_id": "test:1", "predicate": "test", "object_id": "test:2"}) + b"\n")
 
     return bundle_dir
 
@@ -66,11 +73,11 @@ def bundle_directory(sample_manifest_data, tmp_path):
 def bundle_zip(bundle_directory, tmp_path):
     """Create a ZIP file from bundle directory."""
     zip_path = tmp_path / "bundle.zip"
-    with zipfile.ZipFile(zip_path, "w") as zf:
-        for file_path in bundle_directory.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(bundle_directory)
-                zf.write(file_path, arcname)
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for root, _dirs, files in os.walk(bundle_directory):
+            for name in files:
+                file_path = os.path.join(root, name)
+                zf.write(file_path, os.path.relpath(file_path, bundle_directory))
     return zip_path
 
 
@@ -82,6 +89,87 @@ def test_engine():
     return engine
 
 
+class TestCreateMissingIndexes:
+    """Test _create_missing_indexes() function."""
+
+    def test_adds_index_to_existing_table(self):
+        """Test an index missing from an existing table is created, and reruns are harmless."""
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX rel_subject_predicate_idx")
+
+        _create_missing_indexes(engine)
+        _create_missing_indexes(engine)
+
+        assert "rel_subject_predicate_idx" in {index["name"] for index in inspect(engine).get_indexes("relationship")}
+        # The trigram index is PostgreSQL-only
+        assert "entity_name_trgm_idx" not in {index["name"] for index in inspect(engine).get_indexes("entity")}
+
+    def test_drops_obsolete_indexes(self):
+        """Test single-column indexes made redundant by the composite ones are dropped."""
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX ix_relationship_subject_id ON relationship (subject_id)")
+            conn.exec_driver_sql("CREATE INDEX ix_entity_entity_type ON entity (entity_type)")
+
+        _create_missing_indexes(engine)
+
+        indexes = {index["name"] for index in inspect(engine).get_indexes("relationship")}
+        assert "ix_relationship_subject_id" not in indexes
+        assert {"rel_subject_predicate_idx", "rel_object_predicate_idx"} <= indexes
+        entity_indexes = {index["name"] for index in inspect(engine).get_indexes("entity")}
+        assert "ix_entity_entity_type" not in entity_indexes
+        assert "entity_type_status_idx" in entity_indexes
+
+
+class TestDropOutdatedRelationshipTable:
+    """Test _drop_outdated_relationship_table() function."""
+
+    def test_drops_uuid_keyed_table(self, caplog):
+        """Test a relationship table with the old UUID key is dropped, with a warning, and its bundle forgotten."""
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE relationship (id CHAR(32) NOT NULL PRIMARY KEY, subject_id VARCHAR, predicate VARCHAR, object_id VARCHAR)")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Bundle(bundle_id="old", domain="test", created_at=datetime.now(), bundle_version="v1"))
+            session.commit()
+
+        with caplog.at_level(logging.WARNING, logger="query.bundle_loader"):
+            _drop_outdated_relationship_table(engine)
+        assert "outdated" in caplog.text
+        SQLModel.metadata.create_all(engine)
+
+        with Session(engine) as session:
+            storage = SQLiteStorage(session=session)
+            assert not storage.is_bundle_loaded("old")
+            session.add(Relationship(subject_id="a", predicate="p", object_id="b"))
+            session.commit()
+            assert storage.get_relationship("a", "p", "b").id == 1
+
+    def test_keeps_table_without_id_column(self):
+        """Test a relationship table with no id column is left alone instead of failing the lookup."""
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE relationship (subject_id VARCHAR, predicate VARCHAR, object_id VARCHAR)")
+
+        _drop_outdated_relationship_table(engine)
+
+        assert inspect(engine).has_table("relationship")
+
+    def test_keeps_current_table(self, populated_storage):
+        """Test a relationship table with the integer key is left alone."""
+        engine = populated_storage.engine
+        count = populated_storage.count_relationships()
+
+        _drop_outdated_relationship_table(engine)
+
+        assert count > 0
+        assert populated_storage.count_relationships() == count
+
+
 class TestFindManifest:
     """Test _find_manifest() function."""
 
@@ -128,6 +216,145 @@ class TestFindManifest:
         assert found == root_manifest
 
 
+class TestFindManifestInZip:
+    """Test _find_manifest_in_zip() function."""
+
+    def test_find_manifest_in_zip_root(self, bundle_zip):
+        """Test finding manifest.json at the archive root."""
+        with zipfile.ZipFile(bundle_zip) as zf:
+            assert _find_manifest_in_zip(zf) == "manifest.json"
+
+    def test_find_manifest_in_zip_subdirectory(self, tmp_path):
+        """Test finding manifest.json one directory deep in the archive."""
+        zip_path = tmp_path / "nested.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("bundle/manifest.json", "{}")
+            zf.writestr("bundle/deeper/manifest.json", "{}")
+
+        with zipfile.ZipFile(zip_path) as zf:
+            assert _find_manifest_in_zip(zf) == "bundle/manifest.json"
+
+    def test_find_manifest_in_zip_not_found(self, tmp_path):
+        """Test when the archive has no manifest.json within one level."""
+        zip_path = tmp_path / "deep.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("a/b/manifest.json", "{}")
+
+        with zipfile.ZipFile(zip_path) as zf:
+            assert _find_manifest_in_zip(zf) is None
+
+
+class TestIterBundleLines:
+    """Test _iter_bundle_lines() function."""
+
+    def test_lines_from_disk(self, tmp_path):
+        """Test blank lines, CRLF endings and a final line without a newline."""
+        path = tmp_path / "documents.jsonl"
+        path.write_bytes(b'{"a": 1}\r\n\n  \n{"b": 2}\n{"c": 3}')
+
+        assert list(_iter_bundle_lines(path, None)) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+    def test_empty_file(self, tmp_path):
+        """Test that an empty file yields nothing."""
+        path = tmp_path / "documents.jsonl"
+        path.write_bytes(b"")
+
+        assert not list(_iter_bundle_lines(path, None))
+
+    def test_lines_from_zip(self, tmp_path):
+        """Test reading lines out of an archive."""
+        zip_path = tmp_path / "bundle.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("documents.jsonl", '{"a": 1}\n\n{"b": 2}')
+
+        with zipfile.ZipFile(zip_path) as zf:
+            assert list(_iter_bundle_lines(PurePosixPath("documents.jsonl"), zf)) == [b'{"a": 1}', b'{"b": 2}']
+
+
+class TestCopyBundleFile:
+    """Test _copy_bundle_file() function."""
+
+    def test_copy_from_disk(self, tmp_path):
+        """Test copying a file on disk, including one larger than a single read."""
+        source = tmp_path / "source.bin"
+        payload = bytes(range(256)) * 4096
+        source.write_bytes(payload)
+        dest = tmp_path / "dest.bin"
+        dest.write_bytes(b"stale contents that are longer than nothing")
+
+        _copy_bundle_file(source, dest, None)
+
+        assert dest.read_bytes() == payload
+
+    def test_copy_from_zip(self, tmp_path):
+        """Test copying a file out of an archive."""
+        zip_path = tmp_path / "assets.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("docs/index.md", "# Hello")
+
+        dest = tmp_path / "index.md"
+        with zipfile.ZipFile(zip_path) as zf:
+            _copy_bundle_file(PurePosixPath("docs/index.md"), dest, zf)
+
+        assert dest.read_text() == "# Hello"
+
+
+class TestLoadDocumentAssets:
+    """Test _load_document_assets() function."""
+
+    @pytest.fixture
+    def app_dir(self, tmp_path, monkeypatch):
+        """Redirect the /app install locations into a temporary directory."""
+        app_dir = tmp_path / "app"
+        monkeypatch.setattr("query.bundle_loader._DOCS_DIR", app_dir / "docs")
+        monkeypatch.setattr("query.bundle_loader._MKDOCS_YML", app_dir / "mkdocs.yml")
+        monkeypatch.setattr("query.bundle_loader._ASSETS_SENTINEL", app_dir / "docs" / ".mkdocs_built_bundle")
+        return app_dir
+
+    @pytest.fixture
+    def docs_bundle(self, sample_manifest_data, tmp_path):
+        """Create a bundle directory with one document asset."""
+        bundle_dir = tmp_path / "docs_bundle"
+        (bundle_dir / "docs").mkdir(parents=True)
+        (bundle_dir / "docs" / "index.md").write_text("# v1")
+        (bundle_dir / "documents.jsonl").write_text(json.dumps({"path": "docs/index.md"}) + "\n")
+        manifest = BundleManifestV1.model_validate({**sample_manifest_data, "documents_file": "documents.jsonl"})
+        return bundle_dir, manifest
+
+    def test_assets_skipped_when_already_installed(self, app_dir, docs_bundle, monkeypatch):
+        """Test that assets are only copied again for a new bundle or a forced reload."""
+        bundle_dir, manifest = docs_bundle
+        _load_document_assets(bundle_dir, manifest)
+        assert (app_dir / "docs" / "index.md").read_text() == "# v1"
+
+        (bundle_dir / "docs" / "index.md").write_text("# v2")
+        _load_document_assets(bundle_dir, manifest)
+        assert (app_dir / "docs" / "index.md").read_text() == "# v1"
+
+        monkeypatch.setenv("BUNDLE_FORCE_RELOAD", "1")
+        _load_document_assets(bundle_dir, manifest)
+        assert (app_dir / "docs" / "index.md").read_text() == "# v2"
+
+    def test_failed_mkdocs_build_is_retried(self, app_dir, docs_bundle, monkeypatch):
+        """Test that no sentinel is written when the MkDocs build fails."""
+        bundle_dir, manifest = docs_bundle
+        app_dir.mkdir()
+        (app_dir / "mkdocs.yml").write_text("site_name: test")
+        builds = []
+
+        def failing_build():
+            builds.append(1)
+            return False
+
+        monkeypatch.setattr("query.bundle_loader._build_mkdocs", failing_build)
+
+        _load_document_assets(bundle_dir, manifest)
+        _load_document_assets(bundle_dir, manifest)
+
+        assert len(builds) == 2
+        assert not (app_dir / "docs" / ".mkdocs_built_bundle").exists()
+
+
 class TestLoadFromDirectory:
     """Test _load_from_directory() function."""
 
@@ -138,20 +365,38 @@ class TestLoadFromDirectory:
         # Should not raise
         _load_from_directory(test_engine, db_url, bundle_directory)
 
-        # Verify data was loaded
-        storage = SQLiteStorage(":memory:")
-        # Note: SQLiteStorage creates its own engine, so we can't easily verify
-        # the data was loaded. This test mainly verifies no exceptions are raised.
-        storage.close()
+        # Verify data was loaded through the given engine
+        with Session(test_engine) as session:
+            storage = SQLiteStorage(session=session)
+            assert storage.is_bundle_loaded("test-bundle-123")
+            assert storage.get_entity("test:1") is not None
 
-    def test_load_from_directory_no_manifest(self, tmp_path, test_engine):
+    def test_force_reload(self, bundle_directory, test_engine, monkeypatch):
+        """Test that BUNDLE_FORCE_RELOAD replaces an already loaded bundle."""
+        db_url = "sqlite:///:memory:"
+        _load_from_directory(test_engine, db_url, bundle_directory)
+
+        (bundle_directory / "entities.jsonl").write_text(json.dumps({"entity_id": "test:2", "entity_type": "test", "name": "Test 2"}) + "\n")
+        _load_from_directory(test_engine, db_url, bundle_directory)
+        with Session(test_engine) as session:
+            assert SQLiteStorage(session=session).get_entity("test:2") is None
+
+        monkeypatch.setenv("BUNDLE_FORCE_RELOAD", "on")
+        _load_from_directory(test_engine, db_url, bundle_directory)
+        with Session(test_engine) as session:
+            storage = SQLiteStorage(session=session)
+            assert storage.get_entity("test:1") is None
+            assert storage.get_entity("test:2") is not None
+
+    def test_load_from_directory_no_manifest(self, tmp_path, test_engine, caplog):
         """Test loading from directory without manifest."""
         empty_dir = tmp_path / "empty"
         empty_dir.mkdir()
 
         db_url = "sqlite:///:memory:"
-        # Should handle gracefully (prints error but doesn't raise)
+        # Should handle gracefully (logs an error but doesn't raise)
         _load_from_directory(test_engine, db_url, empty_dir)
+        assert [record.levelname for record in caplog.records if "No manifest.json" in record.message] == ["ERROR"]
 
 
 class TestLoadFromZip:
@@ -164,13 +409,37 @@ class TestLoadFromZip:
         # Should not raise
         _load_from_zip(test_engine, db_url, bundle_zip)
 
-    def test_load_from_zip_no_manifest(self, tmp_path, test_engine):
+    def test_load_from_zip_in_subdirectory(self, bundle_directory, tmp_path, test_engine):
+        """Test loading a ZIP whose bundle sits in a top-level directory."""
+        zip_path = tmp_path / "nested.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            for file_path in bundle_directory.iterdir():
+                zf.write(file_path, f"bundle/{file_path.name}")
+
+        db_url = "sqlite:///:memory:"
+
+        # Should not raise
+        _load_from_zip(test_engine, db_url, zip_path)
+
+    def test_load_from_zip_already_loaded_skips_extraction(self, bundle_zip, test_engine, monkeypatch):
+        """Test that nothing is extracted when the bundle is already loaded."""
+        db_url = "sqlite:///:memory:"
+        _load_from_zip(test_engine, db_url, bundle_zip)
+
+        extracted = []
+        monkeypatch.setattr(zipfile.ZipFile, "extract", lambda self, member, path=None, pwd=None: extracted.append(member))
+        _load_from_zip(test_engine, db_url, bundle_zip)
+
+        assert not extracted
+
+    def test_load_from_zip_no_manifest(self, tmp_path, test_engine, caplog):
         """Test loading ZIP without manifest."""
         zip_path = tmp_path / "empty.zip"
-        with zipfile.ZipFile(zip_path, "w"):
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED):
             # Create empty ZIP
             pass
 
         db_url = "sqlite:///:memory:"
-        # Should handle gracefully (prints error but doesn't raise)
+        # Should handle gracefully (logs an error but doesn't raise)
         _load_from_zip(test_engine, db_url, zip_path)
+        assert [record.levelname for record in caplog.records if "No manifest.json" in record.message] == ["ERROR"]
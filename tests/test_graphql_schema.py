@@ -8,12 +8,25 @@ Tests cover:
 - Pagination types and metadata
 - Filter functionality
 - Max limit enforcement
+- Nested subject/object entities loaded in batches
+- Query depth and cost limits
 """
 
+# pylint: disable=protected-access
+import asyncio
+import threading
+import pytest
+import strawberry
+from sqlalchemy import event
+from query import graphql_limits
+from query import graphql_schema as gql_module
+from query.graphql_schema import Query
+from storage.models import Relationship
 
-def execute_query(schema, query: str, context: dict):
+
+def execute_query(schema, query: str, context: dict, variables: dict | None = None):
     """Helper to execute a GraphQL query."""
-    result = schema.execute_sync(query, context_value=context)
+    result = asyncio.run(schema.execute(query, variable_values=variables, context_value=context))
     if result.errors:
         raise RuntimeError(f"GraphQL errors: {result.errors}")  # pylint: disable=broad-exception-raised
     return result.data
@@ -51,6 +64,23 @@ class TestEntityQueries:
         assert result["entity"]["source"] == "test"
         assert len(result["entity"]["synonyms"]) == 2
 
+    def test_entity_fields_from_fragments(self, graphql_schema, graphql_context):
+        """Test that fields selected through fragments are returned along with direct ones."""
+        query = """
+        query {
+            entity(id: "test:entity:1") {
+                name
+                ...Extra
+                ... on Entity { synonyms }
+            }
+        }
+        fragment Extra on Entity { properties }
+        """
+        result = execute_query(graphql_schema, query, graphql_context)
+        assert result["entity"]["name"] == "Test Character 1"
+        assert len(result["entity"]["synonyms"]) == 2
+        assert result["entity"]["properties"] is not None
+
     def test_entity_not_found(self, graphql_schema, graphql_context):
         """Test querying for non-existent entity."""
         query = """
@@ -109,128 +139,43 @@ class TestEntityQueries:
         # Should skip first entity
         assert result["entities"]["items"][0]["entityId"] != "test:entity:1"
 
-    def test_entities_filter_by_type(self, graphql_schema, graphql_context):
-        """Test filtering entities by entity type."""
+    @pytest.mark.parametrize(
+        "entity_filter,expected_ids",
+        [
+            ({"entityType": "character"}, ["test:entity:1", "test:entity:2"]),
+            ({"name": "Test Character 1"}, ["test:entity:1"]),
+            ({"nameContains": "Character"}, ["test:entity:1", "test:entity:2"]),
+            ({"nameStartsWith": "Test L"}, ["test:entity:3"]),
+            ({"source": "test"}, ["test:entity:1", "test:entity:2", "test:entity:3"]),
+            ({"status": "canonical"}, ["test:entity:1", "test:entity:2", "test:entity:3"]),
+            ({"entityType": "character", "nameContains": "1"}, ["test:entity:1"]),
+        ],
+    )
+    def test_entities_filter(self, graphql_schema, graphql_context, entity_filter, expected_ids):
+        """Test filtering entities by each filter field, alone and combined."""
+        # One document for every case, so only the variables change
         query = """
-        query {
-            entities(limit: 10, filter: { entityType: "character" }) {
+        query ($filter: EntityFilter) {
+            entities(limit: 10, filter: $filter) {
                 items {
                     entityId
                     entityType
-                }
-                total
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
-
-        assert result["entities"]["total"] == 2
-        assert len(result["entities"]["items"]) == 2
-        for item in result["entities"]["items"]:
-            assert item["entityType"] == "character"
-
-    def test_entities_filter_by_name(self, graphql_schema, graphql_context):
-        """Test filtering entities by exact name."""
-        query = """
-        query {
-            entities(limit: 10, filter: { name: "Test Character 1" }) {
-                items {
-                    entityId
-                    name
-                }
-                total
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
-
-        assert result["entities"]["total"] == 1
-        assert result["entities"]["items"][0]["name"] == "Test Character 1"
-
-    def test_entities_filter_name_contains(self, graphql_schema, graphql_context):
-        """Test filtering entities by name containing string."""
-        query = """
-        query {
-            entities(limit: 10, filter: { nameContains: "Character" }) {
-                items {
-                    entityId
                     name
-                }
-                total
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
-
-        assert result["entities"]["total"] == 2
-        for item in result["entities"]["items"]:
-            assert "Character" in item["name"]
-
-    def test_entities_filter_by_source(self, graphql_schema, graphql_context):
-        """Test filtering entities by source."""
-        query = """
-        query {
-            entities(limit: 10, filter: { source: "test" }) {
-                items {
-                    entityId
                     source
-                }
-                total
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
-
-        assert result["entities"]["total"] == 3
-        for item in result["entities"]["items"]:
-            assert item["source"] == "test"
-
-    def test_entities_filter_by_status(self, graphql_schema, graphql_context):
-        """Test filtering entities by status."""
-        query = """
-        query {
-            entities(limit: 10, filter: { status: "canonical" }) {
-                items {
-                    entityId
                     status
                 }
                 total
             }
         }
         """
-        result = execute_query(graphql_schema, query, graphql_context)
+        result = execute_query(graphql_schema, query, graphql_context, variables={"filter": entity_filter})
 
-        assert result["entities"]["total"] == 3
-        for item in result["entities"]["items"]:
-            assert item["status"] == "canonical"
-
-    def test_entities_filter_combined(self, graphql_schema, graphql_context):
-        """Test combining multiple filters."""
-        query = """
-        query {
-            entities(limit: 10, filter: {
-                entityType: "character"
-                nameContains: "1"
-            }) {
-                items {
-                    entityId
-                    name
-                }
-                total
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
-
-        assert result["entities"]["total"] == 1
-        assert result["entities"]["items"][0]["entityId"] == "test:entity:1"
+        assert result["entities"]["total"] == len(expected_ids)
+        assert sorted(item["entityId"] for item in result["entities"]["items"]) == expected_ids
 
     def test_entities_max_limit_enforcement(self, graphql_schema, graphql_context, monkeypatch):
         """Test that max limit is enforced."""
-        import query.graphql_schema as gql_module
-
-        original_max = gql_module.MAX_LIMIT
-        gql_module.MAX_LIMIT = 5  # Set low for testing
+        monkeypatch.setattr(gql_module, "MAX_LIMIT", 5)  # Set low for testing
 
         query = """
         query {
@@ -247,9 +192,6 @@ class TestEntityQueries:
         # Limit should be capped at MAX_LIMIT
         assert result["entities"]["limit"] == 5
 
-        # Restore original
-        gql_module.MAX_LIMIT = original_max
-
 
 class TestRelationshipQueries:
     """Test relationship-related GraphQL queries."""
@@ -337,8 +279,7 @@ class TestRelationshipQueries:
         result = execute_query(graphql_schema, query, graphql_context)
 
         assert result["relationships"]["total"] == 2
-        for item in result["relationships"]["items"]:
-            assert item["subjectId"] == "test:entity:1"
+        assert {item["subjectId"] for item in result["relationships"]["items"]} == {"test:entity:1"}
 
     def test_relationships_filter_by_object(self, graphql_schema, graphql_context):
         """Test filtering relationships by object ID."""
@@ -356,8 +297,7 @@ class TestRelationshipQueries:
         result = execute_query(graphql_schema, query, graphql_context)
 
         assert result["relationships"]["total"] == 2
-        for item in result["relationships"]["items"]:
-            assert item["objectId"] == "test:entity:3"
+        assert {item["objectId"] for item in result["relationships"]["items"]} == {"test:entity:3"}
 
     def test_relationships_filter_by_predicate(self, graphql_schema, graphql_context):
         """Test filtering relationships by predicate."""
@@ -374,8 +314,7 @@ class TestRelationshipQueries:
         result = execute_query(graphql_schema, query, graphql_context)
 
         assert result["relationships"]["total"] == 2
-        for item in result["relationships"]["items"]:
-            assert item["predicate"] == "co_occurs_with"
+        assert {item["predicate"] for item in result["relationships"]["items"]} == {"co_occurs_with"}
 
     def test_relationships_filter_combined(self, graphql_schema, graphql_context):
         """Test combining multiple relationship filters."""
@@ -403,10 +342,7 @@ class TestRelationshipQueries:
 
     def test_relationships_max_limit_enforcement(self, graphql_schema, graphql_context, monkeypatch):
         """Test that max limit is enforced for relationships."""
-        import query.graphql_schema as gql_module
-
-        original_max = gql_module.MAX_LIMIT
-        gql_module.MAX_LIMIT = 5  # Set low for testing
+        monkeypatch.setattr(gql_module, "MAX_LIMIT", 5)  # Set low for testing
 
         query = """
         query {
@@ -423,8 +359,232 @@ class TestRelationshipQueries:
         # Limit should be capped at MAX_LIMIT
         assert result["relationships"]["limit"] == 5
 
-        # Restore original
-        gql_module.MAX_LIMIT = original_max
+
+class TestReadCache:
+    """Test that repeated root lookups in one request hit storage once."""
+
+    def test_repeated_entity_lookup(self, graphql_schema, graphql_context, monkeypatch):
+        """Test aliased lookups of the same entity and fields share one storage read."""
+        storage = graphql_context["storage"]
+        reads = []
+        get_entity = storage.get_entity
+        monkeypatch.setattr(storage, "get_entity", lambda entity_id, **kwargs: reads.append(entity_id) or get_entity(entity_id, **kwargs))
+        query = """
+        query {
+            a: entity(id: "test:entity:1") { name }
+            b: entity(id: "test:entity:1") { name }
+            c: entity(id: "test:entity:2") { name }
+        }
+        """
+        result = execute_query(graphql_schema, query, graphql_context)
+        assert result["a"]["name"] == result["b"]["name"] == "Test Character 1"
+        assert sorted(reads) == ["test:entity:1", "test:entity:2"]
+
+        # A new request starts with an empty cache
+        execute_query(graphql_schema, query, {"storage": storage})
+        assert len(reads) == 4
+
+    def test_lookups_with_different_fields_read_separately(self, graphql_schema, graphql_context, monkeypatch):
+        """Test a lookup selecting other fields of a cached entity reads its own columns."""
+        storage = graphql_context["storage"]
+        reads = []
+        get_entity = storage.get_entity
+        monkeypatch.setattr(storage, "get_entity", lambda entity_id, **kwargs: reads.append(kwargs["columns"]) or get_entity(entity_id, **kwargs))
+        query = """
+        query {
+            a: entity(id: "test:entity:1") { entityId }
+            b: entity(id: "test:entity:1") { properties synonyms }
+        }
+        """
+        result = execute_query(graphql_schema, query, graphql_context)
+        assert result["b"]["synonyms"] == ["TC1", "TestChar1"]
+        assert sorted(reads) == [("entity_id",), ("properties", "synonyms")]
+
+
+class TestStorageThreads:
+    """Test that blocking storage calls stay off the event loop."""
+
+    def test_storage_called_off_event_loop(self, graphql_schema, graphql_context, monkeypatch):
+        """Test that root and nested lookups run storage on worker threads, one call at a time."""
+        storage = graphql_context["storage"]
+        threads, active = [], []
+
+        def recording(method):
+            def call(*args, **kwargs):
+                threads.append(threading.get_ident())
+                active.append(None)
+                assert len(active) == 1, "storage calls of one request overlapped"
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    active.pop()
+
+            return call
+
+        for name in ("get_entity", "get_entities", "count_entities", "find_relationships", "get_entities_by_ids", "get_bundle_info"):
+            monkeypatch.setattr(storage, name, recording(getattr(storage, name)))
+        query = """
+        query {
+            entity(id: "test:entity:1") { name }
+            entities(limit: 2) { total items { entityId } }
+            relationships(limit: 2) { items { subject { entityId } } }
+            bundle { bundleId }
+        }
+        """
+
+        async def run():
+            return threading.get_ident(), await graphql_schema.execute(query, context_value=graphql_context)
+
+        loop_thread, result = asyncio.run(run())
+        assert result.errors is None
+        assert len(threads) == 6
+        assert loop_thread not in threads
+
+    @pytest.mark.parametrize(
+        "query, key",
+        [
+            # The second alias selects columns the first one's row left unread
+            ('{ a: entity(id: "test:entity:1") { entityId } b: entity(id: "test:entity:1") { properties synonyms } }', "b"),
+            # The lookup finds the entity the listing left in the session with only its ID read
+            ('{ entities(limit: 3) { items { entityId } } entity(id: "test:entity:1") { properties synonyms } }', "entity"),
+        ],
+        ids=["aliases", "after_listing"],
+    )
+    def test_partial_rows_not_loaded_on_event_loop(self, graphql_schema, graphql_context, query, key):
+        """Test no column of an entity read for fewer fields is lazy-loaded on the event loop thread."""
+        storage = graphql_context["storage"]
+        storage._session.expunge_all()  # start from an empty session, as each server request does
+        threads = []
+
+        def record(*_args):
+            threads.append(threading.get_ident())
+
+        async def run():
+            return threading.get_ident(), await graphql_schema.execute(query, context_value={"storage": storage})
+
+        event.listen(storage.engine, "before_cursor_execute", record)
+        try:
+            loop_thread, result = asyncio.run(run())
+        finally:
+            event.remove(storage.engine, "before_cursor_execute", record)
+        assert result.errors is None
+        assert result.data[key]["synonyms"] == ["TC1", "TestChar1"]
+        assert threads and loop_thread not in threads
+
+
+class TestNestedEntities:
+    """Test subject and object entities resolved through the entity DataLoader."""
+
+    def test_relationship_entities_batched(self, graphql_schema, graphql_context, monkeypatch):
+        """Test that the entities of a whole relationship page are fetched in one storage call."""
+        storage = graphql_context["storage"]
+        batches = []
+        get_entities_by_ids = storage.get_entities_by_ids
+
+        def recording_get_entities_by_ids(ids):
+            batches.append(list(ids))
+            return get_entities_by_ids(ids)
+
+        monkeypatch.setattr(storage, "get_entities_by_ids", recording_get_entities_by_ids)
+        monkeypatch.setattr(storage, "get_entity", None)  # nested resolvers must not look up one at a time
+        query = """
+        query {
+            relationships(limit: 10) {
+                items {
+                    subjectId
+                    objectId
+                    subject { entityId name }
+                    object { entityId }
+                }
+            }
+        }
+        """
+        result = asyncio.run(graphql_schema.execute(query, context_value=graphql_context))
+        assert result.errors is None
+
+        for item in result.data["relationships"]["items"]:
+            assert item["subject"]["entityId"] == item["subjectId"]
+            assert item["object"]["entityId"] == item["objectId"]
+        assert len(batches) == 1
+        assert sorted(batches[0]) == ["test:entity:1", "test:entity:2", "test:entity:3"]
+
+    def test_missing_related_entity(self, graphql_schema, populated_storage):
+        """Test that a relationship whose object is not stored resolves it to null."""
+        populated_storage._session.add(Relationship(subject_id="test:entity:1", predicate="mentions", object_id="test:entity:missing"))
+        populated_storage._session.commit()
+        query = """
+        query {
+            relationship(subjectId: "test:entity:1", predicate: "mentions", objectId: "test:entity:missing") {
+                subject { entityId }
+                object { entityId }
+            }
+        }
+        """
+        result = asyncio.run(graphql_schema.execute(query, context_value={"storage": populated_storage}))
+        assert result.errors is None
+        assert result.data["relationship"]["subject"]["entityId"] == "test:entity:1"
+        assert result.data["relationship"]["object"] is None
+
+
+class TestQueryLimits:
+    """Test that overly deep or expensive queries are rejected before execution."""
+
+    def limited_schema(self):
+        """Build a schema with the same limit extensions as the server."""
+        return strawberry.Schema(query=Query, extensions=graphql_limits.query_limit_extensions())
+
+    def test_query_within_limits(self, graphql_context):
+        """Test that an ordinary nested query passes both limits."""
+        query = """
+        query {
+            relationships(limit: 10) {
+                items { subject { entityId } }
+                total
+            }
+        }
+        """
+        result = asyncio.run(self.limited_schema().execute(query, context_value=graphql_context))
+        assert result.errors is None
+
+    def test_aliased_lists_over_cost(self, graphql_context, monkeypatch):
+        """Test that aliased list fields are summed against the cost limit."""
+        monkeypatch.setattr(graphql_limits, "MAX_QUERY_COST", 150)
+        schema = self.limited_schema()
+        storage = graphql_context["storage"]
+        monkeypatch.setattr(storage, "get_entities", None)  # rejected queries must not reach storage
+
+        result = asyncio.run(schema.execute("{ a: entities { total } b: entities(limit: 60) { total } }", context_value=graphql_context))
+        assert result.errors is not None
+        assert "more than the maximum of 150" in result.errors[0].message
+
+        monkeypatch.undo()
+        result = asyncio.run(schema.execute("{ a: entities { total } b: entities(limit: 50) { total } }", context_value=graphql_context))
+        assert result.errors is None
+
+    def test_fragment_spreads_and_variables_counted(self, graphql_context, monkeypatch):
+        """Test that each fragment spread adds its cost and variable limits count as MAX_LIMIT."""
+        monkeypatch.setattr(graphql_limits, "MAX_QUERY_COST", 250)
+        query = """
+        query ($n: Int!) {
+            entities(limit: $n) { total }
+            ...Rels
+            ...Rels
+            ...Rels
+            ...Rels
+        }
+        fragment Rels on Query { relationships(limit: 40) { total } }
+        """
+        result = asyncio.run(self.limited_schema().execute(query, variable_values={"n": 1}, context_value=graphql_context))
+        assert result.errors is not None
+        assert "could return 260 rows" in result.errors[0].message
+
+    def test_depth_limit(self, graphql_context, monkeypatch):
+        """Test that selections nested deeper than MAX_QUERY_DEPTH are rejected."""
+        monkeypatch.setattr(graphql_limits, "MAX_QUERY_DEPTH", 2)
+        query = "{ relationships { items { subject { entityId } } } }"
+        result = asyncio.run(self.limited_schema().execute(query, context_value=graphql_context))
+        assert result.errors is not None
+        assert "exceeds maximum operation depth" in result.errors[0].message
 
 
 class TestBundleQuery:
@@ -463,6 +623,13 @@ class TestBundleQuery:
         assert result["bundle"] is None
 
 
+@pytest.fixture(scope="session")
+def schema_fields(graphql_schema):
+    """Map each of the schema's own types to its field and input field names, introspected once."""
+    types = graphql_schema.introspect()["__schema"]["types"]
+    return {t["name"]: {f["name"] for f in (t["fields"] or t["inputFields"] or ())} for t in types if not t["name"].startswith("__")}
+
+
 class TestFieldNaming:
     """Test that GraphQL field names use camelCase."""
 
@@ -506,25 +673,15 @@ class TestFieldNaming:
         assert result["relationship"]["objectId"] == "test:entity:2"
         assert len(result["relationship"]["sourceDocuments"]) == 2
 
-    def test_relationship_no_id_field(self, graphql_schema, graphql_context):
+    def test_relationship_no_id_field(self, schema_fields):
         """Test that relationship id field is not exposed in GraphQL."""
-        query = """
-        query {
-            relationship(
-                subjectId: "test:entity:1"
-                predicate: "co_occurs_with"
-                objectId: "test:entity:2"
-            ) {
-                subjectId
-                predicate
-                objectId
-            }
-        }
-        """
-        result = execute_query(graphql_schema, query, graphql_context)
+        assert "id" not in schema_fields["Relationship"]
+        assert {"subjectId", "predicate", "objectId"} <= schema_fields["Relationship"]
 
-        # Verify id field is not in the result
-        assert "id" not in result["relationship"]
+    def test_no_snake_case_fields(self, schema_fields):
+        """Test that no field or input field of the schema's own types is snake_case."""
+        snake_case = {(type_name, name) for type_name, names in schema_fields.items() for name in names if "_" in name}
+        assert not snake_case
 
 
 class TestPaginationMetadata:
@@ -573,3 +730,108 @@ class TestPaginationMetadata:
         assert page["limit"] == 2  # Requested limit
         assert page["offset"] == 1  # Requested offset
         assert len(page["items"]) == 2  # Actual items returned
+
+    def test_entities_cursor_pagination(self, graphql_schema, graphql_context):
+        """Test walking through entities with endCursor/after."""
+        query = """
+        query ($after: String) {
+            entities(limit: 2, after: $after) {
+                items {
+                    entityId
+                }
+                pageInfo {
+                    endCursor
+                    hasNextPage
+                }
+            }
+        }
+        """
+        seen = []
+        after = None
+        for _ in range(3):
+            result = asyncio.run(graphql_schema.execute(query, variable_values={"after": after}, context_value=graphql_context))
+            assert result.errors is None
+            page = result.data["entities"]
+            seen.extend(item["entityId"] for item in page["items"])
+            after = page["pageInfo"]["endCursor"]
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+
+        assert seen == ["test:entity:1", "test:entity:2", "test:entity:3"]
+
+    def test_relationships_cursor_pagination(self, graphql_schema, graphql_context):
+        """Test that the relationship cursor continues after the last triple of the page."""
+        query = """
+        query ($after: String) {
+            relationships(limit: 2, after: $after) {
+                items {
+                    subjectId
+                    predicate
+                    objectId
+                }
+                pageInfo {
+                    endCursor
+                    hasNextPage
+                }
+            }
+        }
+        """
+        first = asyncio.run(graphql_schema.execute(query, variable_values={"after": None}, context_value=graphql_context)).data["relationships"]
+        assert len(first["items"]) == 2
+        assert first["pageInfo"]["hasNextPage"] is True
+
+        second = asyncio.run(graphql_schema.execute(query, variable_values={"after": first["pageInfo"]["endCursor"]}, context_value=graphql_context)).data["relationships"]
+        assert len(second["items"]) == 1
+        assert second["pageInfo"]["hasNextPage"] is False
+
+        triples = {(r["subjectId"], r["predicate"], r["objectId"]) for r in first["items"] + second["items"]}
+        assert len(triples) == 3
+
+    def test_total_counted_only_when_selected(self, graphql_schema, graphql_context, monkeypatch):
+        """Test that the count query is skipped when the client does not ask for total."""
+        storage = graphql_context["storage"]
+        count_calls = []
+        count_entities = storage.count_entities
+        monkeypatch.setattr(storage, "count_entities", lambda **filters: count_calls.append(filters) or count_entities(**filters))
+
+        result = execute_query(graphql_schema, "query { entities(limit: 1) { items { entityId } } }", graphql_context)
+        assert len(result["entities"]["items"]) == 1
+        assert not count_calls
+
+        result = execute_query(graphql_schema, 'query { entities(filter: {entityType: "character"}) { total } }', graphql_context)
+        assert result["entities"]["total"] == 2
+        assert count_calls[0]["entity_type"] == "character"
+
+    def test_only_selected_columns_read(self, graphql_schema, graphql_context, monkeypatch):
+        """Test that list queries ask storage only for the columns the query selects."""
+        storage = graphql_context["storage"]
+        calls = []
+        get_entities, find_relationships = storage.get_entities, storage.find_relationships
+        monkeypatch.setattr(storage, "get_entities", lambda **kwargs: calls.append(kwargs["columns"]) or get_entities(**kwargs))
+        monkeypatch.setattr(storage, "find_relationships", lambda **kwargs: calls.append(kwargs["columns"]) or find_relationships(**kwargs))
+
+        query = """
+        query {
+            entities(limit: 2) { items { name ... on Entity { usageCount } } }
+            relationships(limit: 2) { ...Page }
+        }
+        fragment Page on RelationshipPage { items { confidence object { name } } }
+        """
+        # The nested object entity is resolved asynchronously
+        result = asyncio.run(graphql_schema.execute(query, context_value=graphql_context))
+        assert result.errors is None
+        assert result.data["entities"]["items"][0]["name"] == "Test Character 1"
+        assert calls == [["entity_id", "name", "usage_count"], ["confidence", "object_id", "predicate", "subject_id"]]
+
+    def test_invalid_cursor(self, graphql_schema, graphql_context):
+        """Test that a malformed cursor is reported as an error."""
+        query = """
+        query {
+            entities(after: "not-a-cursor") {
+                total
+            }
+        }
+        """
+        result = asyncio.run(graphql_schema.execute(query, context_value=graphql_context))
+        assert result.errors is not None
+        assert "Invalid cursor" in result.errors[0].message
@@ -8,39 +8,42 @@ Tests cover:
 """
 
 # pylint: disable=protected-access
+from typing import get_args
+import orjson
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel
 
 from query.routers import rest_api
+from storage.backends.json_columns import JSON_ENGINE_ARGS
+from storage.backends.sqlite import SQLiteStorage
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def app():
-    """Create FastAPI app with REST API router."""
+    """Create FastAPI app with REST API router. Each client sets and clears its own dependency overrides."""
     app = FastAPI()
     app.include_router(rest_api.router)
     return app
 
 
 @pytest.fixture
-def file_storage(tmp_path, sample_entities, sample_relationships):
+def file_storage(sample_entities, sample_relationships):
     """Create SQLite storage for thread-safe testing with FastAPI TestClient.
 
-    Uses tmp_path which automatically cleans up files after tests.
-    Can't use :memory: here because FastAPI TestClient runs in a different thread.
+    FastAPI TestClient runs handlers in a different thread, so the in-memory database
+    sits on a single connection (StaticPool) that every thread shares.
     """
-    from storage.backends.sqlite import SQLiteStorage
-
-    # tmp_path is automatically cleaned up by pytest, so no files left behind
-    db_path = tmp_path / "test.db"
-    storage = SQLiteStorage(str(db_path))
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, **JSON_ENGINE_ARGS)
+    SQLModel.metadata.create_all(engine)
+    storage = SQLiteStorage(session=Session(engine))
 
-    # Add entities and relationships
-    for entity in sample_entities:
-        storage._session.add(entity)
-    for rel in sample_relationships:
-        storage._session.add(rel)
+    # Flushed together at commit; the entities, whose keys are known up front, go out in one executemany
+    storage._session.add_all([*sample_entities, *sample_relationships])
     storage._session.commit()
 
     try:
@@ -48,10 +51,7 @@ def file_storage(tmp_path, sample_entities, sample_relationships):
     finally:
         # Ensure cleanup even if test fails
         storage.close()
-        # Explicitly remove the database file (tmp_path cleanup should handle this,
-        # but being explicit ensures no files are left behind)
-        if db_path.exists():
-            db_path.unlink()
+        engine.dispose()
 
 
 @pytest.fixture
@@ -77,7 +77,7 @@ class TestGetEntityById:
         """Test retrieving an existing entity."""
         response = client.get("/api/v1/entities/test:entity:1")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert data["entity_id"] == "test:entity:1"
         assert data["name"] == "Test Character 1"
         assert data["entity_type"] == "character"
@@ -86,7 +86,7 @@ class TestGetEntityById:
         """Test retrieving a non-existent entity returns 404."""
         response = client.get("/api/v1/entities/nonexistent")
         assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
+        assert "not found" in orjson.loads(response.content)["detail"].lower()
 
 
 class TestListEntities:
@@ -96,7 +96,7 @@ class TestListEntities:
         """Test listing entities with default parameters."""
         response = client.get("/api/v1/entities")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert isinstance(data, list)
         assert len(data) == 3  # All entities in test data
 
@@ -104,14 +104,14 @@ class TestListEntities:
         """Test listing entities with limit."""
         response = client.get("/api/v1/entities?limit=2")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
 
     def test_list_entities_with_offset(self, client):
         """Test listing entities with offset."""
         response = client.get("/api/v1/entities?limit=2&offset=1")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
         # Should skip first entity
         assert data[0]["entity_id"] != "test:entity:1"
@@ -120,9 +120,14 @@ class TestListEntities:
         """Test listing entities with offset beyond available."""
         response = client.get("/api/v1/entities?limit=10&offset=100")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 0
 
+    def test_list_items_match_single_entity(self, client):
+        """Test list items carry exactly the fields of the single-entity response."""
+        items = {item["entity_id"]: item for item in orjson.loads(client.get("/api/v1/entities").content)}
+        assert items["test:entity:1"] == orjson.loads(client.get("/api/v1/entities/test:entity:1").content)
+
 
 class TestFindRelationships:
     """Test GET /api/v1/relationships endpoint."""
@@ -131,7 +136,7 @@ class TestFindRelationships:
         """Test finding all relationships."""
         response = client.get("/api/v1/relationships")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert isinstance(data, list)
         assert len(data) == 3  # All relationships in test data
 
@@ -139,34 +144,31 @@ class TestFindRelationships:
         """Test filtering relationships by subject_id."""
         response = client.get("/api/v1/relationships?subject_id=test:entity:1")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
-        for rel in data:
-            assert rel["subject_id"] == "test:entity:1"
+        assert {rel["subject_id"] for rel in data} == {"test:entity:1"}
 
     def test_find_relationships_by_object(self, client):
         """Test filtering relationships by object_id."""
         response = client.get("/api/v1/relationships?object_id=test:entity:3")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
-        for rel in data:
-            assert rel["object_id"] == "test:entity:3"
+        assert {rel["object_id"] for rel in data} == {"test:entity:3"}
 
     def test_find_relationships_by_predicate(self, client):
         """Test filtering relationships by predicate."""
         response = client.get("/api/v1/relationships?predicate=co_occurs_with")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
-        for rel in data:
-            assert rel["predicate"] == "co_occurs_with"
+        assert {rel["predicate"] for rel in data} == {"co_occurs_with"}
 
     def test_find_relationships_combined_filters(self, client):
         """Test filtering relationships with multiple filters."""
         response = client.get("/api/v1/relationships?subject_id=test:entity:1&predicate=co_occurs_with")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 1
         rel = data[0]
         assert rel["subject_id"] == "test:entity:1"
@@ -177,12 +179,27 @@ class TestFindRelationships:
         """Test limiting relationship results."""
         response = client.get("/api/v1/relationships?limit=2")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 2
 
     def test_find_relationships_no_matches(self, client):
         """Test finding relationships with no matches."""
         response = client.get("/api/v1/relationships?subject_id=nonexistent")
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.content)
         assert len(data) == 0
+
+
+class TestListResponseShape:
+    """Test the list responses, which bypass response_model validation, still match their models."""
+
+    @pytest.mark.parametrize("path", ["/api/v1/entities", "/api/v1/relationships"])
+    def test_items_match_response_model(self, app, client, path):
+        """Test every item has exactly the response model's fields and validates against it."""
+        route = next(route for route in app.routes if getattr(route, "path", None) == path)
+        (model,) = get_args(route.response_model)
+        items = orjson.loads(client.get(path).content)
+
+        assert items
+        assert all(set(item) == set(model.model_fields) for item in items)
+        TypeAdapter(route.response_model).validate_python(items)